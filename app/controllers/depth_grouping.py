@@ -0,0 +1,60 @@
+import numpy as np
+import math
+
+
+class DepthGrouping:
+    """
+    Group levels of depth by price step and cut depth to max levels. Work in WS thread.
+
+    Step = tick size * multiplier. Tick size unknown from server, so it found as smallest difference
+    between prices (rounded down to power of 10) and remembered for every data_id.
+    Buy prices rounded down, sell prices rounded up, so group never cross spread.
+    Result side: np.ndarray with rows [price, quantity, total], sorted by price from high to low,
+    total - cumulative quantity from best price to this price.
+
+    multiplier and max_levels change from GUI thread, assignment of attribute is atomic, so lock not needed.
+    """
+
+    MULTIPLIERS = (1, 10, 100, 1000)
+    MAX_LEVELS = 50
+
+    def __init__(self, multiplier=1, max_levels=MAX_LEVELS):
+        self.multiplier = multiplier
+        self.max_levels = max_levels
+        # {data_id: tick size, ...}
+        self._ticks = dict()
+
+    def apply(self, data_id, buy, sell):
+        """Return grouped (buy, sell)"""
+        tick = self._tick_size(data_id, buy, sell)
+        step = tick * self.multiplier if tick else None
+        return self._group(buy, step, is_buy=True), self._group(sell, step, is_buy=False)
+
+    def _tick_size(self, data_id, buy, sell):
+        prices = np.unique(np.concatenate((buy[:, 0], sell[:, 0])))
+        differences = np.diff(prices)
+        differences = differences[differences > 0]
+        tick = self._ticks.get(data_id)
+        if len(differences):
+            found = 10 ** math.floor(math.log10(differences.min()) + 1e-9)
+            tick = found if tick is None else min(tick, found)
+            self._ticks[data_id] = tick
+        return tick
+
+    def _group(self, side, step, is_buy):
+        if not len(side):
+            return np.empty((0, 3))
+        # from best price: buy from high to low, sell from low to high
+        order = np.argsort(-side[:, 0] if is_buy else side[:, 0], kind='stable')
+        prices, quantities = side[order, 0], side[order, 1]
+        if step and self.multiplier > 1:
+            rounding = np.floor if is_buy else np.ceil
+            # step is power of 10 or multiple, round result to remove float noise
+            prices = np.round(rounding(np.round(prices / step, 6)) * step, 12)
+            first = np.flatnonzero(np.concatenate(([True], prices[1:] != prices[:-1])))
+            prices, quantities = prices[first], np.add.reduceat(quantities, first)
+
+        prices, quantities = prices[:self.max_levels], quantities[:self.max_levels]
+        grouped = np.column_stack((prices, quantities, np.cumsum(quantities)))
+        # sell shown from high to low, so best sell price near best buy price
+        return grouped if is_buy else grouped[::-1]
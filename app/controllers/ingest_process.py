@@ -0,0 +1,233 @@
+"""
+Ingest of WS messages in separate process.
+
+WS connection, JSON decode, normalization and depth grouping work in worker process, so they do not take GIL
+from GUI thread. Worker write records (pickled MarketEvent) in shared memory ring buffer, GUI process read
+all records by timer. Commands (sub, unsub, settings) go to worker through multiprocessing queue.
+While buffer full (GUI busy), records wait in worker: candles and states all in order, ticker and depth
+only last snapshot of every data_id (count of replaced snapshots published in counters of buffer).
+"""
+from app.controllers.ws_consumer import WSConsumer
+from app.controllers import messages
+from multiprocessing import shared_memory
+from collections import OrderedDict, deque
+import multiprocessing
+import numpy as np
+import asyncio
+import pickle
+import struct
+
+
+class SharedRingBuffer:
+    """
+    Ring buffer of bytes records in shared memory. One writer process and one reader process.
+
+    Header: write position and read position (uint64, count of bytes from start, never decrease),
+    then COUNTERS uint64 counters, that writer publish for reader (statistics).
+    Record: uint32 length + bytes. Writer publish write position only after record written,
+    reader publish read position after records read, so lock not needed.
+    """
+
+    HEADER_SIZE = 64
+    COUNTERS = HEADER_SIZE // 8 - 2
+    DEFAULT_CAPACITY = 16 * 1024 * 1024
+    _LENGTH = struct.Struct('<I')
+
+    def __init__(self, name=None, capacity=DEFAULT_CAPACITY):
+        """
+        :param name: name of existing shared memory for attach, if None, then new shared memory created
+        :param capacity: size of data area in bytes for new buffer
+        """
+        self._is_owner = name is None
+        if self._is_owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=self.HEADER_SIZE + capacity)
+        else:
+            self._memory = self._attach(name)
+        self._capacity = self._memory.size - self.HEADER_SIZE
+        header = np.ndarray((self.HEADER_SIZE // 8, ), dtype=np.uint64, buffer=self._memory.buf)
+        if self._is_owner:
+            header[:] = 0
+        # [write position, read position]
+        self._positions = header[:2]
+        self.counters = header[2:]
+        self._data = self._memory.buf[self.HEADER_SIZE:self.HEADER_SIZE + self._capacity]
+
+    @staticmethod
+    def _attach(name):
+        """Attach to shared memory, owner (creator) of memory will unlink it"""
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13 always register memory in resource tracker. Worker started by spawn use resource tracker
+            # of GUI process, so memory registered once and unregistered by unlink of owner
+            return shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def _copy_in(self, position, data):
+        start = position % self._capacity
+        first = min(len(data), self._capacity - start)
+        self._data[start:start + first] = data[:first]
+        self._data[:len(data) - first] = data[first:]
+
+    def _copy_out(self, position, size):
+        start = position % self._capacity
+        first = min(size, self._capacity - start)
+        return bytes(self._data[start:start + first]) + bytes(self._data[:size - first])
+
+    def write(self, payload):
+        """Write record. Return False, if not enough free space (record not written)"""
+        size = self._LENGTH.size + len(payload)
+        write, read = int(self._positions[0]), int(self._positions[1])
+        if size > self._capacity - (write - read):
+            return False
+        self._copy_in(write, self._LENGTH.pack(len(payload)))
+        self._copy_in(write + self._LENGTH.size, payload)
+        self._positions[0] = write + size
+        return True
+
+    def read_all(self):
+        """Return list of all written records and free their space"""
+        write, read = int(self._positions[0]), int(self._positions[1])
+        records = []
+        while read < write:
+            length, = self._LENGTH.unpack(self._copy_out(read, self._LENGTH.size))
+            records.append(self._copy_out(read + self._LENGTH.size, length))
+            read += self._LENGTH.size + length
+        self._positions[1] = read
+        return records
+
+    def close(self):
+        del self._positions, self.counters
+        self._data.release()
+        self._memory.close()
+        if self._is_owner:
+            self._memory.unlink()
+
+
+class IngestWorker(WSConsumer):
+    """WS consumer of worker process, write events in ring buffer"""
+
+    # record with state of connection: (STATE_RECORD, state)
+    STATE_RECORD = 'connection_state'
+    # kinds of snapshots: waiting snapshot replaced by newer snapshot of same data_id, count of replaced
+    # snapshots of kind in counter of buffer with index of kind
+    COALESCED_KINDS = (messages.TICKER_TYPE, messages.DEPTH_TYPE)
+    # seconds between attempts to write waiting records, while buffer full
+    RETRY_INTERVAL = 0.005
+
+    def __init__(self, ws_address, ring):
+        super().__init__(self.publish, self.set_state, ws_address)
+        self._ring = ring
+        # payloads of records, that wait free space: all ordered records and last snapshot of data_id
+        self._ordered = deque()
+        self._latest = OrderedDict()
+
+    def _write_pending(self):
+        """Write waiting records, until buffer full. Ordered records first, like UpdateDispatcher"""
+        while self._ordered:
+            if not self._ring.write(self._ordered[0]):
+                return
+            self._ordered.popleft()
+        while self._latest:
+            data_id = next(iter(self._latest))
+            if not self._ring.write(self._latest[data_id]):
+                return
+            del self._latest[data_id]
+
+    def publish(self, event):
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        if event.kind in self.COALESCED_KINDS:
+            if event.data_id in self._latest:
+                self._ring.counters[self.COALESCED_KINDS.index(event.kind)] += 1
+            self._latest[event.data_id] = payload
+        else:
+            self._ordered.append(payload)
+        self._write_pending()
+
+    def set_state(self, state):
+        self._ordered.append(pickle.dumps((IngestWorker.STATE_RECORD, state), protocol=pickle.HIGHEST_PROTOCOL))
+        self._write_pending()
+
+    async def async_write_pending(self):
+        """Write waiting records, when GUI free space in buffer (without new messages from server)"""
+        while True:
+            await asyncio.sleep(self.RETRY_INTERVAL)
+            if self._ordered or self._latest:
+                self._write_pending()
+
+    async def async_read_commands(self, commands):
+        """Execute commands from GUI process until 'stop' command"""
+        loop = asyncio.get_event_loop()
+        while True:
+            command = await loop.run_in_executor(None, commands.get)
+            if command[0] == 'stop':
+                return
+            elif command[0] == 'send':
+                await self.async_send_message(action=command[1], data_id=command[2])
+            elif command[0] == 'history':
+                await self.async_request_history(*command[1:])
+            elif command[0] == 'depth_grouping':
+                self.depth_grouping.multiplier, self.depth_grouping.max_levels = command[1], command[2]
+
+
+def run_worker(ws_address, ring_name, commands):
+    """Entry point of worker process"""
+    ring = SharedRingBuffer(ring_name)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    worker = IngestWorker(ws_address, ring)
+    loop.create_task(worker.async_start_consume())
+    loop.create_task(worker.async_write_pending())
+    try:
+        loop.run_until_complete(worker.async_read_commands(commands))
+    finally:
+        ring.close()
+
+
+class IngestProcess:
+    """GUI side of worker process: start and stop worker, send commands, read records"""
+
+    # worker created by 'spawn', fork of process with GUI and threads is not safe
+    START_METHOD = 'spawn'
+
+    def __init__(self, ws_address, capacity=SharedRingBuffer.DEFAULT_CAPACITY):
+        self._ws_address = ws_address
+        self._capacity = capacity
+        self._ring = None
+        self._commands = None
+        self._process = None
+
+    def start(self):
+        context = multiprocessing.get_context(self.START_METHOD)
+        self._ring = SharedRingBuffer(capacity=self._capacity)
+        self._commands = context.Queue()
+        self._process = context.Process(target=run_worker, args=(self._ws_address, self._ring.name, self._commands),
+                                        daemon=True)
+        self._process.start()
+
+    def send(self, action, data_id):
+        self._commands.put(('send', action, data_id))
+
+    def request_history(self, data_id, before, limit):
+        self._commands.put(('history', data_id, before, limit))
+
+    def set_depth_grouping(self, multiplier, max_levels):
+        self._commands.put(('depth_grouping', multiplier, max_levels))
+
+    def read(self):
+        """Return list of records: MarketEvent or (IngestWorker.STATE_RECORD, state)"""
+        return [pickle.loads(payload) for payload in self._ring.read_all()]
+
+    def dropped(self):
+        """Return {kind: count, ...} of snapshots, that replaced by newer snapshot in worker"""
+        return {kind: int(self._ring.counters[index]) for index, kind in enumerate(IngestWorker.COALESCED_KINDS)}
+
+    def stop(self, timeout=2.):
+        self._commands.put(('stop', ))
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
+        self._ring.close()
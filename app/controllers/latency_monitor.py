@@ -0,0 +1,205 @@
+"""
+Latency of market messages on hot path from WS frame receive to repaint.
+
+Times of every stage are taken by time.perf_counter (monotonic clock of system, so times of ingest process
+and GUI process comparable) and saved as latency from receive of WS frame:
+    decode - message decoded, normalized (and depth grouped) in WS thread or ingest process
+    emit - dispatcher emit signal in GUI thread (include wait in dispatcher queue)
+    slot - controller slot start
+    paint - repaint of widget with data (chart, depth table, tickers table) end
+"""
+from collections import deque
+import threading
+import json
+import math
+import time
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with log buckets: BUCKETS_PER_DECADE buckets for every decade from MIN_LATENCY
+    to MIN_LATENCY * 10^DECADES seconds. Add is O(1) and memory constant, percentiles have error less than
+    one bucket (~10% with 24 buckets per decade).
+    """
+
+    MIN_LATENCY = 1e-6
+    DECADES = 8
+    BUCKETS_PER_DECADE = 24
+
+    def __init__(self):
+        self._counts = [0] * (self.DECADES * self.BUCKETS_PER_DECADE + 1)
+        self.count = 0
+        self.max = 0.
+
+    def add(self, latency):
+        """Add latency in seconds"""
+        if latency > self.MIN_LATENCY:
+            bucket = min(int(math.log10(latency / self.MIN_LATENCY) * self.BUCKETS_PER_DECADE),
+                         len(self._counts) - 1)
+        else:
+            bucket = 0
+        self._counts[bucket] += 1
+        self.count += 1
+        if latency > self.max:
+            self.max = latency
+
+    def percentile(self, q):
+        """Return latency in seconds (upper edge of bucket), that not less than q percents of latencies"""
+        if not self.count:
+            return None
+        rank, total = q / 100. * self.count, 0
+        for bucket, count in enumerate(self._counts):
+            total += count
+            if total >= rank and count:
+                return min(self.MIN_LATENCY * 10 ** ((bucket + 1) / self.BUCKETS_PER_DECADE), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Return count, p50, p99 and max in milliseconds"""
+        if not self.count:
+            return dict(count=0)
+        return dict(count=self.count, p50=self.percentile(50) * 1000, p99=self.percentile(99) * 1000,
+                    max=self.max * 1000)
+
+
+class LatencyMonitor:
+    """
+    Histograms of latency for every kind of stream (ticker, depth, candles, ...) and stage (STAGES),
+    messages/sec by kind, queue depth and dropped (replaced) snapshots of dispatcher.
+
+    Record methods are thread safe and return at once, if monitor disabled.
+    Repaint of widget can be after some messages, so expect_paint save receive time of applied message
+    and painted record paint latency for all saved messages of widget.
+
+    """
+
+    DECODE_STAGE = 'decode'
+    EMIT_STAGE = 'emit'
+    SLOT_STAGE = 'slot'
+    PAINT_STAGE = 'paint'
+    STAGES = (DECODE_STAGE, EMIT_STAGE, SLOT_STAGE, PAINT_STAGE)
+
+    # count of seconds for messages/sec
+    RATE_WINDOW = 5.
+    # max count of messages, that wait paint of one widget (widget can be hidden)
+    MAX_PENDING_PAINTS = 1000
+
+    def __init__(self, dispatcher=None, enabled=False):
+        """
+        :param dispatcher: UpdateDispatcher for queue depth and dropped messages
+        :param enabled: if False, then nothing recorded until enable
+        """
+        self.enabled = enabled
+        # count of users (HUD of tabs), that enabled monitor
+        self._users = 0
+        self._dispatcher = dispatcher
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        """Enable recording for one more user, monitor work until all users disable it"""
+        self._users += 1
+        self.enabled = True
+
+    def disable(self):
+        self._users = max(self._users - 1, 0)
+        self.enabled = self._users > 0
+
+    def reset(self):
+        with self._lock:
+            # {(kind, stage): LatencyHistogram, ...}
+            self._histograms = dict()
+            # {kind: deque([decode time, ...]), ...} - for messages/sec
+            self._decoded = dict()
+            # {(kind, target): deque([receive time, ...]), ...}
+            self._pending_paints = dict()
+            self._started = time.perf_counter()
+
+    def _add(self, kind, stage, latency):
+        histogram = self._histograms.get((kind, stage))
+        if histogram is None:
+            histogram = self._histograms[(kind, stage)] = LatencyHistogram()
+        histogram.add(latency)
+
+    def record_events(self, stage, events):
+        """Record stage of MarketEvents (list or one event), all events got stage now"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            for event in events if isinstance(events, list) else (events, ):
+                if event.received is not None:
+                    self._add(event.kind, stage, now - event.received)
+
+    def record_decoded(self, event):
+        """Record decode stage and count message for messages/sec"""
+        if not self.enabled or event.received is None:
+            return
+        with self._lock:
+            self._add(event.kind, self.DECODE_STAGE, event.decoded - event.received)
+            decoded = self._decoded.get(event.kind)
+            if decoded is None:
+                decoded = self._decoded[event.kind] = deque()
+            decoded.append(event.decoded)
+            while decoded[0] < event.decoded - self.RATE_WINDOW:
+                decoded.popleft()
+
+    def expect_paint(self, target, events):
+        """Messages (list or one event) applied to widget target, paint latency recorded by painted"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for event in events if isinstance(events, list) else (events, ):
+                if event.received is None:
+                    continue
+                key = (event.kind, target)
+                pending = self._pending_paints.get(key)
+                if pending is None:
+                    pending = self._pending_paints[key] = deque(maxlen=self.MAX_PENDING_PAINTS)
+                pending.append(event.received)
+
+    def painted(self, target):
+        """Widget target painted, record paint latency of all applied messages"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            for (kind, key_target), pending in self._pending_paints.items():
+                if key_target != target:
+                    continue
+                while pending:
+                    self._add(kind, self.PAINT_STAGE, now - pending.popleft())
+
+    def forget(self, target):
+        """Remove messages, that wait paint of widget target (widget will be deleted)"""
+        with self._lock:
+            for key in [key for key in self._pending_paints if key[1] is target]:
+                del self._pending_paints[key]
+
+    def snapshot(self):
+        """
+        Return dict for HUD and JSON:
+            {'kinds': {kind: {'messages_per_sec': float, stage: {count, p50, p99, max}, ...}, ...},
+             'queue_depth': int, 'max_queue_depth': int, 'dropped': {kind: int, ...}}
+        Latencies in milliseconds from receive of WS frame.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            window = min(self.RATE_WINDOW, max(now - self._started, 1e-9))
+            kinds = dict()
+            for (kind, stage), histogram in self._histograms.items():
+                kinds.setdefault(kind, dict())[stage] = histogram.to_dict()
+            for kind, decoded in self._decoded.items():
+                kinds.setdefault(kind, dict())['messages_per_sec'] = \
+                    sum(1 for decoded_at in decoded if decoded_at >= now - window) / window
+        result = dict(kinds=kinds)
+        if self._dispatcher is not None:
+            stats = self._dispatcher.stats()
+            result.update(queue_depth=stats['queue_depth'], max_queue_depth=stats['max_queue_depth'],
+                          dropped=stats['dropped'])
+        return result
+
+    def dump(self, path):
+        """Save snapshot in JSON file"""
+        with open(path, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
@@ -0,0 +1,86 @@
+from collections import namedtuple
+import numpy as np
+import importlib
+import json
+
+
+TICKER_TYPE = 'ticker'
+CANDLES_TYPE = 'candles'
+DEPTH_TYPE = 'depth'
+LISTING_TYPE = 'listing_info'
+ERROR_TYPE = 'error'
+
+STARTING_ACTION = 'starting'
+UPDATE_ACTION = 'update'
+# page of older candles: client send {"action": "history", "data_id": <candles data_id>, "before": time,
+# "limit": count}, server answer 'history.<data_id>' with up to limit candles older than time (empty - no more)
+HISTORY_ACTION = 'history'
+
+# Message from server after decode and normalization.
+#   kind - TICKER_TYPE, CANDLES_TYPE, DEPTH_TYPE, LISTING_TYPE or ERROR_TYPE
+#   action - first part of data_id (STARTING_ACTION, UPDATE_ACTION, HISTORY_ACTION), None for listing
+#   exchange, pair, time_frame - parts of data_id or None
+#   data - ticker: (bid, ask) floats
+#          candles: np.ndarray float64 [open, high, low, close, volume, time] (one row for update)
+#          depth: (buy, sell), every side is np.ndarray float64 with rows [price, quantity]
+#                 (WSManager group it by DepthGrouping, then rows [price, quantity, total])
+#          listing: {exchange: [[time_frames], [pairs]], ...}
+#          error: error text from server
+#   received, decoded - time.perf_counter() of WS frame receive and end of decode (for LatencyMonitor) or None
+MarketEvent = namedtuple('MarketEvent', ['kind', 'action', 'data_id', 'exchange', 'pair', 'time_frame', 'data',
+                                         'received', 'decoded'], defaults=(None, None))
+
+
+def get_json_decoder():
+    """Return loads function of fastest available JSON library (orjson, ujson or json)"""
+    for name in ('orjson', 'ujson'):
+        try:
+            return importlib.import_module(name).loads
+        except ImportError:
+            continue
+    return json.loads
+
+
+class MessageParser:
+    """Decode raw WS message and normalize it in MarketEvent. Work in WS thread, so GUI thread get ready data"""
+
+    def __init__(self, loads=None):
+        """
+        :param loads: JSON decode function, if None, then fastest available
+        """
+        self._loads = loads or get_json_decoder()
+
+    def parse(self, raw):
+        """Return MarketEvent or None for unknown message"""
+        message = self._loads(raw)
+        return self.normalize(message)
+
+    @staticmethod
+    def normalize(message):
+        """Return MarketEvent from decoded message or None for unknown message"""
+        data_id = message['data_id']
+        fragment_id = data_id.split('.')
+        action = fragment_id[0] if len(fragment_id) > 1 else None
+        kind = fragment_id[1] if len(fragment_id) > 1 else data_id
+        exchange = fragment_id[2] if len(fragment_id) > 2 else None
+        pair = fragment_id[3] if len(fragment_id) > 3 else None
+        time_frame = fragment_id[4] if len(fragment_id) > 4 else None
+
+        if 'error' in message:
+            return MarketEvent(ERROR_TYPE, action, data_id, exchange, pair, time_frame, message['error'])
+        if data_id == LISTING_TYPE:
+            return MarketEvent(LISTING_TYPE, None, data_id, None, None, None, message['data'])
+
+        data = message['data']
+        if kind == TICKER_TYPE:
+            data = (float(data[0]), float(data[1]))
+        elif kind == CANDLES_TYPE:
+            data = np.asarray(data, dtype=np.float64)
+            if action in (STARTING_ACTION, HISTORY_ACTION):
+                data = data.reshape(-1, 6)
+        elif kind == DEPTH_TYPE:
+            data = (np.asarray(data[0], dtype=np.float64).reshape(-1, 2),
+                    np.asarray(data[1], dtype=np.float64).reshape(-1, 2))
+        else:
+            return None
+        return MarketEvent(kind, action, data_id, exchange, pair, time_frame, data)
@@ -0,0 +1,147 @@
+"""
+Opt-in profiling of GUI hot path, controlled by environment variables:
+    QUOTES_PROFILE - if set (not empty and not '0'), then slots of controller and paint methods of chart items
+        wrapped by timers (count, total, mean and max time of every method)
+    QUOTES_PROFILE_DIR - folder for stats files, default 'profile_stats' in current folder
+    QUOTES_PROFILE_WINDOW - seconds of cProfile window (0 - without cProfile), cProfile work only in windows,
+        so overhead of cProfile not distort all session
+    QUOTES_PROFILE_PERIOD - seconds between starts of cProfile windows
+
+Stats written on exit: timers.json and window_<number>.prof for every cProfile window (python -m pstats, snakeviz).
+If QUOTES_PROFILE not set, then install do nothing, so methods not wrapped and profiling cost nothing.
+"""
+from PyQt5 import QtCore
+import functools
+import importlib
+import cProfile
+import atexit
+import time
+import json
+import os
+
+
+class Profiler:
+    """Timers on methods of classes and cProfile windows in GUI thread"""
+
+    ENV_ENABLE = 'QUOTES_PROFILE'
+    ENV_DIR = 'QUOTES_PROFILE_DIR'
+    ENV_WINDOW = 'QUOTES_PROFILE_WINDOW'
+    ENV_PERIOD = 'QUOTES_PROFILE_PERIOD'
+
+    DEFAULT_DIR = 'profile_stats'
+    DEFAULT_PERIOD = 60.
+
+    # (module, class, methods) wrapped by timers
+    TARGETS = (
+        ('app.controllers.tab_chart_controller', 'TabChartController',
+         ('_update_chart_slot', '_update_depth_slot', '_update_ticker_slot')),
+        ('app.models.chart_item.stock_price_series', 'StockPriceSeries', ('update_picture', 'paint', 'dataBounds')),
+        ('app.models.chart_item.volume_series', 'VolumeSeries', ('update_picture', 'paint', 'dataBounds')),
+        ('app.models.chart_item.indicator_series', 'IndicatorSeries', ('update_picture', 'paint', 'dataBounds')),
+        ('app.models.chart_item.time_axis', 'CustomAxisItem', ('tickValues', 'tickStrings')),
+    )
+
+    def __init__(self, directory=DEFAULT_DIR, window=0., period=DEFAULT_PERIOD):
+        """
+        :param directory: folder for stats files
+        :param window: seconds of every cProfile window, 0 - without cProfile
+        :param period: seconds between starts of cProfile windows
+        """
+        self._directory = directory
+        self._window = window
+        self._period = max(period, window)
+        # {'Class.method': [count, total seconds, max seconds], ...}
+        self._timers = dict()
+        self._profile = None
+        self._windows = 0
+        self._window_timer = None
+        self._is_written = False
+
+    def wrap(self, cls, name):
+        """Replace method of class by method with timer"""
+        method = getattr(cls, name)
+        stat = self._timers.setdefault(f'{cls.__name__}.{name}', [0, 0., 0.])
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                stat[0] += 1
+                stat[1] += elapsed
+                if elapsed > stat[2]:
+                    stat[2] = elapsed
+        setattr(cls, name, timed)
+
+    def install_timers(self):
+        """Wrap all TARGETS. Call before controllers created, because slots connected as bound methods"""
+        for module, class_name, methods in self.TARGETS:
+            cls = getattr(importlib.import_module(module), class_name)
+            for name in methods:
+                self.wrap(cls, name)
+
+    def start_windows(self, parent=None):
+        """Start cProfile windows by timer of Qt event loop (profile GUI thread)"""
+        if self._window <= 0:
+            return
+        self._window_timer = QtCore.QTimer(parent)
+        self._window_timer.setSingleShot(True)
+        self._window_timer.timeout.connect(self._switch_window)
+        self._window_timer.start(0)
+
+    def _switch_window(self):
+        """Start new cProfile window or stop current window and save it"""
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            self._window_timer.start(int(self._window * 1000))
+        else:
+            self._stop_window()
+            self._window_timer.start(int((self._period - self._window) * 1000))
+
+    def _stop_window(self):
+        if self._profile is None:
+            return
+        self._profile.disable()
+        self._windows += 1
+        os.makedirs(self._directory, exist_ok=True)
+        self._profile.dump_stats(os.path.join(self._directory, f'window_{self._windows:03d}.prof'))
+        self._profile = None
+
+    def stats(self):
+        """Return {'Class.method': {count, total_ms, mean_ms, max_ms}, ...} sorted by total time"""
+        stats = {name: dict(count=count, total_ms=total * 1000, mean_ms=total * 1000 / count, max_ms=maximum * 1000)
+                 for name, (count, total, maximum) in self._timers.items() if count}
+        return dict(sorted(stats.items(), key=lambda item: -item[1]['total_ms']))
+
+    def write(self):
+        """Save timers and current cProfile window (once, on exit)"""
+        if self._is_written:
+            return
+        self._is_written = True
+        if self._window_timer is not None:
+            self._window_timer.stop()
+        self._stop_window()
+        os.makedirs(self._directory, exist_ok=True)
+        with open(os.path.join(self._directory, 'timers.json'), 'w') as file:
+            json.dump(self.stats(), file, indent=2)
+
+
+def install(app):
+    """
+    Install profiler, if it enabled by environment variables. Return Profiler or None.
+
+    :param app: QApplication, stats written when it quit
+    """
+    if os.environ.get(Profiler.ENV_ENABLE, '') in ('', '0'):
+        return None
+    profiler = Profiler(os.environ.get(Profiler.ENV_DIR) or Profiler.DEFAULT_DIR,
+                        float(os.environ.get(Profiler.ENV_WINDOW) or 0),
+                        float(os.environ.get(Profiler.ENV_PERIOD) or Profiler.DEFAULT_PERIOD))
+    profiler.install_timers()
+    profiler.start_windows(app)
+    app.aboutToQuit.connect(profiler.write)
+    atexit.register(profiler.write)
+    return profiler
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+
+class SubscriptionRegistry:
+    """
+    Reference counts of subscribed data_id.
+
+    Many consumers (chart tabs) can subscribe to one data_id, but server get 'sub' only for first consumer
+    and 'unsub' only after last consumer, so one stream from server fan out to all consumers.
+    Order of first subscription kept for replay after reconnect.
+    """
+
+    def __init__(self):
+        # {data_id: count of consumers, ...}
+        self._counts = OrderedDict()
+
+    def add(self, data_id):
+        """Add consumer of data_id. Return True, if it first consumer (need send 'sub' to server)"""
+        self._counts[data_id] = self._counts.get(data_id, 0) + 1
+        return self._counts[data_id] == 1
+
+    def remove(self, data_id):
+        """Remove consumer of data_id. Return True, if it was last consumer (need send 'unsub' to server)"""
+        if data_id not in self._counts:
+            return False
+        self._counts[data_id] -= 1
+        if self._counts[data_id]:
+            return False
+        del self._counts[data_id]
+        return True
+
+    def count(self, data_id):
+        return self._counts.get(data_id, 0)
+
+    def data_ids(self):
+        return list(self._counts.keys())
+
+    def __contains__(self, data_id):
+        return data_id in self._counts
+
+    def __len__(self):
+        return len(self._counts)
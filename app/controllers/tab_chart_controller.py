@@ -1,22 +1,70 @@
-from app.models import TickerTableModel, DepthTableModel, StockPriceSeries, VolumeSeries
-from aiohttp import ClientSession, WebSocketError, ClientConnectorError
+from app.models import TickerTableModel, DepthTableModel, StockPriceSeries, VolumeSeries, CandleStore, CandleCache
+from app.models import IndicatorSeries, SMA, EMA, Bollinger, RSI, VWAP
+from app.models.chart_item.resample import resample, resample_bucket, time_frame_seconds
+from app.models.chart_item.time_axis import format_time
+from app.models.number_format import format_number
+from app.controllers.update_dispatcher import UpdateDispatcher
+from app.controllers.latency_monitor import LatencyMonitor
+from app.controllers.ingest_process import IngestProcess, IngestWorker
+from app.controllers.depth_grouping import DepthGrouping
+from app.controllers.ws_consumer import WSConsumer
+from app.controllers import messages
 from PyQt5 import QtCore, QtWidgets
 from functools import partial
 import pyqtgraph as pg
+import numpy as np
 import asyncio
-import json
-import time
 
 
 class TabChartController(QtCore.QObject):
+    """
+    Controller of one chart tab.
 
-    TICKER_TYPE = 'ticker'
-    CANDLES_TYPE = 'candles'
-    DEPTH_TYPE = 'depth'
-    LISTING_TYPE = 'listing_info'
+    All tabs use one WSManager (one WS connection) and one CandleCache. WSManager count consumers of every data_id,
+    so tabs subscribe and unsubscribe independently, every tab filter messages for itself.
+    """
+
+    TICKER_TYPE = messages.TICKER_TYPE
+    CANDLES_TYPE = messages.CANDLES_TYPE
+    DEPTH_TYPE = messages.DEPTH_TYPE
+    LISTING_TYPE = messages.LISTING_TYPE
+    ERROR_TYPE = messages.ERROR_TYPE
 
     WAITING_CONST = 'loading...'
 
+    # path of persistent candles cache and interval (ms) of writing new candles on disk
+    CANDLE_CACHE_PATH = CandleCache.DEFAULT_PATH
+    CANDLE_CACHE_FLUSH_INTERVAL = 2000
+    _candle_cache_instance = None
+
+    # higher time frame resampled from subscribed time frame, if it give at least this count of candles,
+    # else client subscribe to higher time frame (server history of lower time frame too short)
+    MIN_RESAMPLED_CANDLES = 100
+
+    # count of last candles in memory, older candles removed from chart (still saved in CandleCache),
+    # so memory not grow on long sessions. While user scroll history, limit grows by loaded pages
+    # and return to MAX_CANDLES, when chart scrolled to last candle
+    MAX_CANDLES = 50000
+
+    # page of older candles loaded (from cache or server), when user move left edge of view closer than
+    # HISTORY_MARGIN candles to first candle. Server without history support not answer, after timeout (ms)
+    # history not requested from server until restart
+    HISTORY_PAGE = 500
+    HISTORY_MARGIN = 50
+    HISTORY_TIMEOUT = 10000
+
+    # interval (ms) of update of performance HUD
+    PERF_HUD_INTERVAL = 500
+
+    # max count of cross hair updates per second, if refresh rate of screen unknown
+    CROSSHAIR_RATE = 60
+    CROSSHAIR_TIME_MASK = '%Y-%m-%d %H:%M'
+
+    # indicators in menu: (name, create indicator, color of lines)
+    INDICATORS = (('SMA 20', partial(SMA, 20), 'r'), ('EMA 50', partial(EMA, 50), 'm'),
+                  ('Bollinger 20, 2', partial(Bollinger, 20, 2), 'c'), ('VWAP', VWAP, (255, 140, 0)),
+                  ('RSI 14', partial(RSI, 14), 'b'))
+
     def __init__(self, view):
         super(TabChartController, self).__init__()
         self._view = view
@@ -30,11 +78,21 @@ class TabChartController(QtCore.QObject):
         self._view.depth_table.setModel(self._depth_model)
         self._tickers_model = TickerTableModel(['Pair', 'Bid', 'Ask'])
         self._view.tickers_table.setModel(self._tickers_model)
-        self._prices = StockPriceSeries()
-        self._volumes = VolumeSeries()
+        # one candle store for price chart, volume chart and time axis
+        self._candles = CandleStore(max_count=self.MAX_CANDLES)
+        self._candles.trimmed_signal.connect(self._candles_trimmed_slot)
+        self._candles.prepended_signal.connect(self._candles_prepended_slot)
+        # candles of subscribed time frame, shown candles resampled from it
+        self._base_candles = CandleStore(max_count=self.MAX_CANDLES)
+        self._prices = StockPriceSeries(self._candles)
+        self._volumes = VolumeSeries(self._candles)
         self._view.price_chart.addItem(self._prices)
         self._view.volume_chart.addItem(self._volumes)
         self.axis = self._view.volume_chart.getAxis('bottom')
+        self.axis.set_store(self._candles)
+
+        # candles of viewed charts saved on disk, chart shown from cache before 'starting' message
+        self._candle_cache = TabChartController.get_candle_cache()
 
         # Information about access symbols and time_frames will get after send message to server
         self._view.exchanges_combobox.addItems([self.WAITING_CONST, ])
@@ -53,33 +111,16 @@ class TabChartController(QtCore.QObject):
         self.v_line_vlm = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen('b', width=2))
         self.h_line = pg.InfiniteLine(angle=0, movable=False, pen=pg.mkPen('b', width=2))
         self.chart_with_h_line = None
-
-        # horizontal cross hair line move
-        def mouse_move_h_line(chart, evt):
-            mouse_point = chart.getViewBox().mapSceneToView(evt)
-            if self.h_line not in chart.scene().items():
-                if self.chart_with_h_line:
-                    self.chart_with_h_line.removeItem(self.h_line)
-                self.chart_with_h_line = chart
-                chart.addItem(self.h_line)
-            self.h_line.setPos(mouse_point.y())
-        self.prc_h_line_move_signal = partial(mouse_move_h_line, self._view.price_chart)
-        self.vlm_h_line_move_signal = partial(mouse_move_h_line, self._view.volume_chart)
-
-        self._view.price_chart.scene().sigMouseMoved.connect(self.prc_h_line_move_signal)
-        self._view.volume_chart.scene().sigMouseMoved.connect(self.vlm_h_line_move_signal)
-
-        # vertical cross hair lines move
-        def mouse_move_v_line(evt):
-            if self._view.price_chart.sceneBoundingRect().contains(evt):
-                mouse_point = self._view.price_chart.getViewBox().mapSceneToView(evt)
-                self.v_line_prc.setPos(mouse_point.x())
-                self.v_line_vlm.setPos(mouse_point.x())
-        self.v_line_move_signal = mouse_move_v_line
+        self._is_crosshair = True
         self._view.price_chart.addItem(self.v_line_prc)
         self._view.volume_chart.addItem(self.v_line_vlm)
-        self._view.price_chart.scene().sigMouseMoved.connect(self.v_line_move_signal)
-        self._view.volume_chart.scene().sigMouseMoved.connect(self.v_line_move_signal)
+
+        # mouse moves handled not often than screen refresh, only last position of mouse used
+        screen = QtWidgets.QApplication.primaryScreen()
+        rate_limit = screen.refreshRate() if screen and screen.refreshRate() > 0 else self.CROSSHAIR_RATE
+        self._mouse_proxies = [pg.SignalProxy(chart.scene().sigMouseMoved, rateLimit=rate_limit,
+                                              slot=partial(self._mouse_move_event, chart))
+                               for chart in (self._view.price_chart, self._view.volume_chart)]
 
         self._view.cross_hair_checkbox.stateChanged.connect(self._state_change_crosshair)
 
@@ -92,6 +133,13 @@ class TabChartController(QtCore.QObject):
         self._view.chart_type_combobox.activated.connect(self._change_type_chart_event)
         self._view.chart_type_combobox.addItems(['Candle', 'Bar', 'Line'])
 
+        # indicators calculated from shown candles, {number in INDICATORS: (indicator item, chart), ...}
+        self._indicators = dict()
+        for number, (name, create_indicator, color) in enumerate(self.INDICATORS):
+            action = self._view.indicators_menu.addAction(name)
+            action.setCheckable(True)
+            action.toggled.connect(partial(self._toggle_indicator_event, number))
+
         # scaling charts
         def scale_chart(chart, x_range_start, x_range_end):
             chart.enableAutoRange(axis='y')
@@ -101,16 +149,50 @@ class TabChartController(QtCore.QObject):
         self._view.price_chart.sigXRangeChanged.connect(self.prc_scale_signal)
         self._view.volume_chart.sigXRangeChanged.connect(self.vlm_scale_signal)
 
-        # save event loop link for start thread_save async methods
-        self._loop = asyncio.new_event_loop()
-        self._ws_manager = TabChartController.WSManager(self._loop)
+        # older candles loaded by pages, when chart scrolled to first candle
+        # time of first candle in pending server request or None
+        self._history_request = None
+        self._is_history_end = False
+        self._history_timer = QtCore.QTimer(self)
+        self._history_timer.setSingleShot(True)
+        self._history_timer.timeout.connect(self._history_timeout_event)
+        # checked on change of x range (charts x-linked), but only after user moved any chart:
+        # after reset of store view always start from first candle
+        self._is_history_armed = False
+        self._view.price_chart.sigXRangeChanged.connect(self._check_history_event)
+        for chart in (self._view.price_chart, self._view.volume_chart, self._view.oscillator_chart):
+            chart.getViewBox().sigRangeChangedManually.connect(self._arm_history_event)
+
+        # one WS manager for all tabs
+        self._ws_manager = TabChartController.WSManager.instance()
+
+        # latency from WS receive to repaint of widgets, shown in HUD and saved in JSON
+        self._latency = self._ws_manager.latency
+        self._is_perf_hud = False
+        self._painted_widgets = (self._view.price_chart, self._view.depth_table, self._view.tickers_table)
+        for widget in self._painted_widgets:
+            widget.painted_signal.connect(partial(self._latency.painted, widget))
+        self._perf_hud_timer = QtCore.QTimer(self)
+        self._perf_hud_timer.setInterval(self.PERF_HUD_INTERVAL)
+        self._perf_hud_timer.timeout.connect(self._update_perf_hud)
+        self._view.perf_hud_checkbox.stateChanged.connect(self._state_change_perf_hud)
+        self._view.perf_dump_button.clicked.connect(self._click_perf_dump_button_event)
         # ...connect slot to signal...
-        self._ws_manager.update_ticker_signal.connect(self._update_ticker_slot)
-        self._ws_manager.update_depth_signal.connect(self._update_depth_slot)
-        self._ws_manager.update_candles_signal.connect(self._update_chart_slot)
-        self._ws_manager.update_listing_signal.connect(self._update_listing_slot)
-        self._ws_manager.show_error_signal.connect(self._print_error_slot)
-        self._ws_manager.start()
+        self._connections = [(self._ws_manager.update_ticker_signal, self._update_ticker_slot),
+                             (self._ws_manager.update_depth_signal, self._update_depth_slot),
+                             (self._ws_manager.update_candles_signal, self._update_chart_slot),
+                             (self._ws_manager.update_listing_signal, self._update_listing_slot),
+                             (self._ws_manager.show_error_signal, self._print_error_slot),
+                             (self._ws_manager.connection_state_signal, self._connection_state_slot)]
+        for signal, slot in self._connections:
+            signal.connect(slot)
+        self._connection_state_slot(self._ws_manager.connection_state)
+
+        # depth grouped in WS thread, GUI only set settings
+        self._view.depth_grouping_combobox.addItems([f'{multiplier}x' for multiplier in DepthGrouping.MULTIPLIERS])
+        self._view.depth_grouping_combobox.activated.connect(self._change_depth_grouping_event)
+        self._view.depth_levels_spinbox.setValue(self._ws_manager.depth_grouping.max_levels)
+        self._view.depth_levels_spinbox.valueChanged.connect(self._change_depth_levels_event)
 
         # variables to track changes
         self._current_exchange = self._view.exchanges_combobox.itemText(0)
@@ -118,6 +200,9 @@ class TabChartController(QtCore.QObject):
         self._chart_exchange = None
         self._chart_pair = None
         self._chart_time_frame = None
+        # subscribed time frame and length of shown time frame in seconds (None if shown subscribed candles)
+        self._base_time_frame = None
+        self._resample_seconds = None
 
         self._is_auto_scroll = True
         self.is_auto_scaled_oy = True
@@ -125,42 +210,110 @@ class TabChartController(QtCore.QObject):
         # {exchange: [[time_frames], [pairs]], ...}
         self._listing_info = dict()
 
-        # async task for listener ws
-        self.tasks = dict()
-
-        for i in range(0, 10):
-            if not self._ws_manager.is_ws_connect:
-                time.sleep(1)
-            else:
-                break
-        else:
-            QtWidgets.QMessageBox.critical(None, 'Error', 'Not connection to server')
-            quit(1)
+        # data_id subscribed by this tab, every data_id subscribed by tab once
+        self._data_ids = set()
 
+        # listing will be sent after connect, UI wait it without block. If other tab already get it, use it
+        if self._ws_manager.listing is not None:
+            self._update_listing_slot(self._ws_manager.listing)
         self._send_sub_message(data_id='listing_info')
 
+    @classmethod
+    def get_candle_cache(cls):
+        """Return CandleCache common for all tabs (create it on first call)"""
+        if cls._candle_cache_instance is None:
+            app = QtWidgets.QApplication.instance()
+            cls._candle_cache_instance = CandleCache(cls.CANDLE_CACHE_PATH)
+            timer = QtCore.QTimer(app)
+            timer.timeout.connect(cls._candle_cache_instance.flush)
+            timer.start(cls.CANDLE_CACHE_FLUSH_INTERVAL)
+            app.aboutToQuit.connect(cls._candle_cache_instance.close)
+        return cls._candle_cache_instance
+
+    def close(self):
+        """Unsubscribe all data of tab and disconnect from WS manager. Call before delete tab"""
+        self._state_change_perf_hud(False)
+        for signal, slot in self._connections:
+            signal.disconnect(slot)
+        for data_id in list(self._data_ids):
+            self._send_unsub_message(data_id)
+        # monitor is common for all tabs, it must not keep widgets of deleted tab
+        for widget in self._painted_widgets:
+            self._latency.forget(widget)
+
     # Events
     def _state_change_crosshair(self, state):
+        self._is_crosshair = bool(state)
         if state:
-            self._view.price_chart.scene().sigMouseMoved.connect(self.prc_h_line_move_signal)
-            self._view.volume_chart.scene().sigMouseMoved.connect(self.vlm_h_line_move_signal)
-
             self._view.price_chart.addItem(self.v_line_prc)
             self._view.volume_chart.addItem(self.v_line_vlm)
-
-            self._view.price_chart.scene().sigMouseMoved.connect(self.v_line_move_signal)
-            self._view.volume_chart.scene().sigMouseMoved.connect(self.v_line_move_signal)
         else:
             if self.chart_with_h_line:
                 self.chart_with_h_line.removeItem(self.h_line)
-            self._view.price_chart.scene().sigMouseMoved.disconnect(self.prc_h_line_move_signal)
-            self._view.volume_chart.scene().sigMouseMoved.disconnect(self.vlm_h_line_move_signal)
-
+                self.chart_with_h_line = None
             self._view.price_chart.removeItem(self.v_line_prc)
             self._view.volume_chart.removeItem(self.v_line_vlm)
+            self._view.crosshair_label.setText('')
+
+    def _mouse_move_event(self, chart, args):
+        """Move cross hair lines and show candle under cursor. args - (position in scene, ) from SignalProxy"""
+        if not self._is_crosshair:
+            return
+        mouse_point = chart.getViewBox().mapSceneToView(args[0])
 
-            self._view.price_chart.scene().sigMouseMoved.disconnect(self.v_line_move_signal)
-            self._view.volume_chart.scene().sigMouseMoved.disconnect(self.v_line_move_signal)
+        # horizontal line only on chart under cursor
+        if self.chart_with_h_line is not chart:
+            if self.chart_with_h_line:
+                self.chart_with_h_line.removeItem(self.h_line)
+            self.chart_with_h_line = chart
+            chart.addItem(self.h_line)
+        self.h_line.setPos(mouse_point.y())
+        self.v_line_prc.setPos(mouse_point.x())
+        self.v_line_vlm.setPos(mouse_point.x())
+
+        # x coord of candle is index of candle in store
+        index = int(round(mouse_point.x()))
+        if not 0 <= index < len(self._candles):
+            self._view.crosshair_label.setText('')
+            return
+        open_, high, low, close, volume, time = self._candles[index]
+        self._view.crosshair_label.setText(f'{format_time(time, self.CROSSHAIR_TIME_MASK)}  '
+                                           f'O: {format_number(open_)}  H: {format_number(high)}  '
+                                           f'L: {format_number(low)}  C: {format_number(close)}  '
+                                           f'V: {format_number(volume)}')
+
+    def _state_change_perf_hud(self, state):
+        """Show or hide performance HUD, latency recorded only while some HUD shown"""
+        state = bool(state)
+        if state == self._is_perf_hud:
+            return
+        self._is_perf_hud = state
+        self._view.perf_hud_label.setVisible(state)
+        if state:
+            self._latency.enable()
+            self._update_perf_hud()
+            self._perf_hud_timer.start()
+        else:
+            self._latency.disable()
+            self._perf_hud_timer.stop()
+
+    def _update_perf_hud(self):
+        snapshot = self._latency.snapshot()
+        lines = [f"p50/p99 ms from WS receive | queue {snapshot.get('queue_depth', 0)} "
+                 f"(max {snapshot.get('max_queue_depth', 0)}) | dropped {sum(snapshot.get('dropped', {}).values())}"]
+        for kind, stats in sorted(snapshot['kinds'].items()):
+            stages = ' '.join(f"{stage} {stats[stage]['p50']:.2f}/{stats[stage]['p99']:.2f}"
+                              for stage in LatencyMonitor.STAGES if stats.get(stage, {}).get('count'))
+            lines.append(f"{kind:<12} {stats.get('messages_per_sec', 0.):7.1f} msg/s  {stages}")
+        self._view.perf_hud_label.setText('\n'.join(lines))
+        self._view.perf_hud_label.adjustSize()
+
+    def _click_perf_dump_button_event(self):
+        """Save latency statistics in JSON file for offline analysis"""
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(None, 'Save performance statistics', 'latency.json',
+                                                        'JSON (*.json)')
+        if path:
+            self._latency.dump(path)
 
     def _state_change_scroll_check_box_event(self, state):
         self._is_auto_scroll = state
@@ -189,23 +342,55 @@ class TabChartController(QtCore.QObject):
         self._view.pairs_combobox.addItems([''] + pairs)
 
     def _change_time_frame_event(self, index):
-        """If this new time frame, then unsub to old data and sub to new data"""
+        """
+        If this new time frame, then resample subscribed candles.
+
+        If new time frame can't be resampled from subscribed (lower or not multiple), then unsub to old data
+        and sub to new data.
+
+        """
         new_time_frame = self._view.timeframe_combobox.itemText(index)
         if self._chart_time_frame == new_time_frame:
             return
 
+        self._chart_time_frame = new_time_frame
+        if self._can_resample(new_time_frame):
+            self._show_resampled()
+            return
+
         data_id = '.'.join([TabChartController.CANDLES_TYPE, self._chart_exchange,
-                           self._chart_pair, self._chart_time_frame])
+                           self._chart_pair, self._base_time_frame])
         self._send_unsub_message(data_id)
 
-        self._chart_time_frame = new_time_frame
-        self._prices.set_data([])
-        self._volumes.set_data([])
+        self._base_time_frame = new_time_frame
+        self._show_cached_candles()
 
         data_id = '.'.join([TabChartController.CANDLES_TYPE, self._chart_exchange, self._chart_pair,
-                            self._chart_time_frame])
+                            self._base_time_frame])
         self._send_sub_message(data_id)
 
+    def _toggle_indicator_event(self, number, checked):
+        """Show indicator over price chart or on oscillator chart, or remove it"""
+        if checked:
+            name, create_indicator, color = self.INDICATORS[number]
+            item = IndicatorSeries(create_indicator(store=self._candles), color)
+            chart = self._view.price_chart if item.indicator.IS_OVERLAY else self._view.oscillator_chart
+            chart.addItem(item)
+            self._indicators[number] = (item, chart)
+        elif number in self._indicators:
+            item, chart = self._indicators.pop(number)
+            chart.removeItem(item)
+            # indicator not calculated after remove
+            item.indicator.set_store(None)
+        self._view.oscillator_chart.setVisible(any(chart is self._view.oscillator_chart
+                                                   for item, chart in self._indicators.values()))
+
+    def _change_depth_grouping_event(self, index):
+        self._ws_manager.set_depth_grouping(multiplier=DepthGrouping.MULTIPLIERS[index])
+
+    def _change_depth_levels_event(self, value):
+        self._ws_manager.set_depth_grouping(max_levels=value)
+
     def _change_type_chart_event(self, index):
         chart_types = [StockPriceSeries.CANDLES_TYPE, StockPriceSeries.BAR_TYPE, StockPriceSeries.LINE_TYPE]
         self._prices.set_chart_type(chart_types[index])
@@ -228,7 +413,7 @@ class TabChartController(QtCore.QObject):
         self._tickers_model.update([pair_and_exchange, '-', '-'])
 
     def _click_delete_symbol_button_event(self):
-        """Unsub to ticker and check does it deleted pair pair on chart. if chart updating by this pair, then clear"""
+        """Unsub to ticker. Chart of same pair not changed, it hold own subscriptions of candles and depth"""
         model = self._view.tickers_table.selectionModel()
         if not model.hasSelection():
             return
@@ -243,16 +428,6 @@ class TabChartController(QtCore.QObject):
         self._tickers_model.removeRow(indexes[0].row())
         self._view.tickers_table.selectionModel().clearSelection()
 
-        if exchange == self._chart_exchange and pair == self._chart_pair:
-            data_id = '.'.join([TabChartController.CANDLES_TYPE, self._chart_exchange, self._chart_pair,
-                                self._chart_time_frame])
-            self._send_unsub_message(data_id)
-
-            data_id = '.'.join([TabChartController.DEPTH_TYPE, self._chart_exchange, self._chart_pair])
-            self._send_unsub_message(data_id)
-
-            self._clear_chart_info()
-
     def _double_click_symbol_event(self, index):
         """Select new symbol for show chart and depth"""
         exchange_and_pair = self._view.tickers_table.model().index(index.row(), 0).data()
@@ -263,7 +438,7 @@ class TabChartController(QtCore.QObject):
         # if task, that listener chart and depth, exist then unsub
         if self._chart_exchange and self._chart_pair:
             data_id_chart = '.'.join([TabChartController.CANDLES_TYPE, self._chart_exchange, self._chart_pair,
-                                      self._chart_time_frame])
+                                      self._base_time_frame])
             data_id_depth = '.'.join([TabChartController.DEPTH_TYPE, self._chart_exchange, self._chart_pair])
             self._chart_exchange, self._chart_pair, self._chart_time_frame = None, None, None
             self._send_unsub_message(data_id_chart)
@@ -276,7 +451,9 @@ class TabChartController(QtCore.QObject):
 
         # sub on new data
         self._chart_exchange, self._chart_pair, self._chart_time_frame = new_exchange, new_pair, time_frame
-        data_id = '.'.join([TabChartController.CANDLES_TYPE, new_exchange, new_pair, self._chart_time_frame])
+        self._base_time_frame = time_frame
+        self._show_cached_candles()
+        data_id = '.'.join([TabChartController.CANDLES_TYPE, new_exchange, new_pair, self._base_time_frame])
         self._send_sub_message(data_id)
         data_id = '.'.join([TabChartController.DEPTH_TYPE, new_exchange, new_pair])
         self._send_sub_message(data_id)
@@ -286,15 +463,132 @@ class TabChartController(QtCore.QObject):
         self._chart_pair = None
         self._chart_time_frame = None
         self._chart_exchange = None
+        self._base_time_frame = None
+        self._resample_seconds = None
 
-        self._prices.set_data([])
-        self._volumes.set_data([])
-        self.axis.set_data([])
+        self._reset_history()
+        self._base_candles.clear()
+        self._candles.clear()
         self._depth_model.clear()
         self._view.price_chart.setTitle('')
         self._view.timeframe_combobox.clear()
 
+    def _show_cached_candles(self):
+        """Show candles of current chart from cache, until server send 'starting' message"""
+        self._reset_history()
+        # store keep only MAX_CANDLES last candles, so older candles not loaded
+        self._base_candles.set_data(self._candle_cache.load(self._chart_exchange, self._chart_pair,
+                                                            self._base_time_frame, limit=self.MAX_CANDLES))
+        self._show_resampled()
+
+    def _can_resample(self, time_frame):
+        """Check, that time_frame multiple of subscribed time frame and history enough for it"""
+        base_seconds, seconds = time_frame_seconds(self._base_time_frame), time_frame_seconds(time_frame)
+        if not base_seconds or not seconds or seconds % base_seconds:
+            return False
+        if seconds == base_seconds or not len(self._base_candles):
+            return True
+        times = self._base_candles.time
+        return (times[-1] - times[0]) // seconds + 1 >= self.MIN_RESAMPLED_CANDLES
+
+    def _show_resampled(self):
+        """Show candles of subscribed time frame or resampled in shown time frame"""
+        self._resample_seconds = None
+        if self._chart_time_frame != self._base_time_frame:
+            self._resample_seconds = time_frame_seconds(self._chart_time_frame)
+
+        base = self._base_rows()
+        # view moved to first candle by reset, not by user
+        self._is_history_armed = False
+        self._candles.set_data(resample(base, self._resample_seconds) if self._resample_seconds else base)
+
+    def _base_rows(self, stop=None):
+        """Return candles [0, stop) of subscribed time frame in rows [open, high, low, close, volume, time]"""
+        candles = self._base_candles
+        return np.column_stack((candles.open[:stop], candles.high[:stop], candles.low[:stop],
+                                candles.close[:stop], candles.volume[:stop], candles.time[:stop]))
+
+    def _reset_history(self):
+        """Forget pending request of older candles, history can be loaded again"""
+        self._history_request = None
+        self._is_history_end = False
+        self._is_history_armed = False
+        self._history_timer.stop()
+        self._set_candles_limit(self.MAX_CANDLES)
+
+    def _set_candles_limit(self, max_count):
+        """Set limit of memory for candles of subscribed and shown time frame"""
+        self._base_candles.max_count = max_count
+        self._candles.max_count = max_count
+
+    def _arm_history_event(self, *args):
+        """User moved chart, since now history loaded by change of range"""
+        self._is_history_armed = True
+        self._check_history_event()
+
+    def _check_history_event(self, *args):
+        """Load older candles, if left edge of view near first candle"""
+        if not self._is_history_armed or self._history_request is not None or self._is_history_end \
+                or not self._chart_pair or not len(self._base_candles):
+            return
+        if self._view.price_chart.getViewBox().viewRange()[0][0] > self.HISTORY_MARGIN:
+            return
+
+        if len(self._base_candles) >= self._base_candles.max_count:
+            # user browse history older than limit of memory, limit grows by page
+            self._set_candles_limit(len(self._base_candles) + self.HISTORY_PAGE)
+        before = int(self._base_candles.time[0])
+        candles = self._candle_cache.load_before(self._chart_exchange, self._chart_pair, self._base_time_frame,
+                                                 before, self.HISTORY_PAGE)
+        if len(candles):
+            self._prepend_history(candles)
+            return
+        if self._ws_manager.is_history_supported is False:
+            self._is_history_end = True
+            return
+
+        self._history_request = before
+        self._history_timer.start(self.HISTORY_TIMEOUT)
+        data_id = '.'.join([TabChartController.CANDLES_TYPE, self._chart_exchange, self._chart_pair,
+                            self._base_time_frame])
+        self._ws_manager.request_history(data_id, before, self.HISTORY_PAGE)
+
+    def _history_timeout_event(self):
+        """Server not answer on history request, if it never answer, then it not support history (for all session)"""
+        self._history_request = None
+        self._is_history_end = True
+        if self._ws_manager.is_history_supported is None:
+            self._ws_manager.is_history_supported = False
+
+    def _is_requested_page(self, candles):
+        """Check, that page end just before requested time (other tab of same pair can request other page)"""
+        if not len(candles):
+            return True
+        last = int(candles[:, 5].max())
+        seconds = time_frame_seconds(self._base_time_frame)
+        return last < self._history_request and (seconds is None or last >= self._history_request - seconds)
+
+    def _prepend_history(self, candles):
+        """Add older candles before first candle of chart, shown candles not painted again"""
+        count = self._base_candles.prepend(candles)
+        if not count:
+            self._is_history_end = True
+            return
+        if not self._resample_seconds:
+            self._candles.prepend(self._base_rows(count))
+            return
+
+        # first shown candle can be aggregated from part of his candles, it aggregated again with older candles
+        first_time = int(self._candles.time[0]) if len(self._candles) else None
+        self._candles.prepend(resample(self._base_rows(count), self._resample_seconds))
+        if first_time is not None:
+            self._candles.replace(self._candles.find(first_time),
+                                  resample_bucket(self._base_candles, first_time, self._resample_seconds))
+
     def _scroll(self):
+        # chart follow last candle, history loaded by user not needed in memory
+        if self._base_candles.max_count != self.MAX_CANDLES:
+            self._set_candles_limit(self.MAX_CANDLES)
         vb = self._view.price_chart.getViewBox()
         view_range = vb.viewRange()
 
@@ -313,51 +607,85 @@ class TabChartController(QtCore.QObject):
             do_y = last_close_price + len_y_view_range // 2
             vb.setRange(yRange=[to_y, do_y], padding=0)
 
-    # Slots
-    def _update_depth_slot(self, data):
-        data_id = data['data_id']
-        fragment_id = data_id.split('.')
-        exchange, pair = fragment_id[2], fragment_id[3]
+    def _candles_trimmed_slot(self, count):
+        """Oldest candles removed, x coord of candles decreased, so shift view to same candles"""
+        self._shift_view(-count)
 
-        if self._chart_exchange == exchange and self._chart_pair == pair:
-            self._depth_model.set_data(data['data'][0], data['data'][1])
+    def _candles_prepended_slot(self, count):
+        """Older candles added, x coord of candles increased, so shift view to same candles"""
+        self._shift_view(count)
 
-    def _update_ticker_slot(self, data):
-        data_id = data['data_id']
-        fragment_id = data_id.split('.')
-        exchange, pair = fragment_id[2], fragment_id[3]
-
-        if self._tickers_model.contain(f'{exchange} | {pair}'):
-            data = (f'{exchange} | {pair}', data['data'][0], data['data'][1])
-            self._tickers_model.update(data)
-
-    def _update_chart_slot(self, data):
-        data_id = data['data_id']
-        fragment_id = data_id.split('.')
-        exchange, pair, time_frame = fragment_id[2], fragment_id[3], fragment_id[4]
-
-        if self._chart_exchange != exchange or self._chart_pair != pair or self._chart_time_frame != time_frame:
+    def _shift_view(self, offset):
+        vb = self._view.price_chart.getViewBox()
+        x_range = vb.viewRange()[0]
+        vb.setXRange(x_range[0] + offset, x_range[1] + offset, padding=0)
+
+    def _expect_paint(self, widget, events):
+        """Measure latency of repaint of widget with applied events. Hidden widget not painted, so skipped"""
+        if self._latency.enabled and widget.isVisible():
+            self._latency.expect_paint(widget, events)
+
+    # Slots. All slots get MarketEvent with already parsed data_id and numeric data
+    def _update_depth_slot(self, event):
+        if self._chart_exchange == event.exchange and self._chart_pair == event.pair:
+            self._latency.record_events(LatencyMonitor.SLOT_STAGE, event)
+            self._depth_model.set_data(event.data[0], event.data[1])
+            self._expect_paint(self._view.depth_table, event)
+
+    def _update_ticker_slot(self, events):
+        """Get list of tickers events, all tickers applied in table in one transaction"""
+        rows, applied = [], []
+        for event in events:
+            symbol = f'{event.exchange} | {event.pair}'
+            if self._tickers_model.contain(symbol):
+                rows.append((symbol, event.data[0], event.data[1]))
+                applied.append(event)
+        self._latency.record_events(LatencyMonitor.SLOT_STAGE, applied)
+        self._tickers_model.update_many(rows)
+        self._expect_paint(self._view.tickers_table, applied)
+
+    def _update_chart_slot(self, event):
+        if self._chart_exchange != event.exchange or self._chart_pair != event.pair \
+                or self._base_time_frame != event.time_frame:
             return
-
-        if fragment_id[0] == 'update':
-            ohlc = (float(data['data'][0]), float(data['data'][1]), float(data['data'][2]), float(data['data'][3]),
-                    data['data'][5])
-            volume = (float(data['data'][4]), data['data'][5])
-            self._prices.append_or_replace(ohlc)
-            self._volumes.append_or_replace(volume)
-            self.axis.append(data['data'][5])
+        self._latency.record_events(LatencyMonitor.SLOT_STAGE, event)
+        self._expect_paint(self._view.price_chart, event)
+
+        if event.action == messages.UPDATE_ACTION:
+            # candle in format [open, high, low, close, volume, time]
+            index = self._base_candles.append_or_replace(event.data)
+            self._candle_cache.put(event.exchange, event.pair, event.time_frame, event.data)
+            if index == -1:
+                # older candle, that not in memory, only saved in cache
+                return
+            if self._resample_seconds:
+                # only candle of shown time frame, that contain updated candle, aggregated again
+                self._candles.append_or_replace(resample_bucket(self._base_candles, event.data[5],
+                                                                self._resample_seconds))
+            else:
+                self._candles.append_or_replace(event.data)
             if self._is_auto_scroll:
                 self._scroll()
-        elif fragment_id[0] == 'starting':
-            ohlc = [(float(item[0]), float(item[1]), float(item[2]), float(item[3]), item[5]) for item in data['data']]
-            volume = [(float(item[4]), item[5]) for item in data['data']]
-            times = [item[5] for item in data['data']]
-            self._prices.set_data(ohlc)
-            self._volumes.set_data(volume)
-            self.axis.set_data(times)
-
-    def _update_listing_slot(self, data):
-        self._listing_info = data['data']
+        elif event.action == messages.HISTORY_ACTION:
+            self._ws_manager.is_history_supported = True
+            if self._history_request is None or not self._is_requested_page(event.data):
+                return
+            self._history_request = None
+            self._history_timer.stop()
+            if not len(event.data):
+                self._is_history_end = True
+                return
+            self._candle_cache.put(event.exchange, event.pair, event.time_frame, event.data)
+            self._prepend_history(event.data)
+        elif event.action == messages.STARTING_ACTION:
+            self._reset_history()
+            # server send only last candles, older candles get from cache
+            self._base_candles.set_data(self._candle_cache.merge(event.exchange, event.pair, event.time_frame,
+                                                                 event.data, limit=self.MAX_CANDLES))
+            self._show_resampled()
+
+    def _update_listing_slot(self, event):
+        self._listing_info = event.data
 
         self._view.exchanges_combobox.clear()
         self._view.exchanges_combobox.addItems(self._listing_info.keys())
@@ -371,87 +699,206 @@ class TabChartController(QtCore.QObject):
         self._view.timeframe_combobox.setEnabled(True)
         self._view.delete_ticker_button.setEnabled(True)
 
-    def _print_error_slot(self, message):
+    def _connection_state_slot(self, state):
+        """Show state of connection to server"""
+        self._view.connection_label.setText(f'Server: {state}')
+
+    def _print_error_slot(self, event):
         """Slot for show error message and delete UI item from error data_id"""
-        QtWidgets.QMessageBox.critical(None, 'Error', f"Error at server {message['data_id']}: {message['error']}")
+        exchange, pair = event.exchange, event.pair
+        if event.action == messages.HISTORY_ACTION:
+            # server has not older candles, chart not changed
+            if self._history_request is not None and self._chart_exchange == exchange and self._chart_pair == pair:
+                self._history_timer.stop()
+                self._history_request = None
+                self._is_history_end = True
+            return
+        # errors get all tabs, show only errors of data of this tab (data_id of error has action prefix)
+        data_id = event.data_id.split('.', 1)[1] if event.action is not None else event.data_id
+        is_chart = self._chart_exchange == exchange and self._chart_pair == pair
+        if data_id not in self._data_ids and not self._tickers_model.contain(f'{exchange} | {pair}') \
+                and not is_chart:
+            return
+        QtWidgets.QMessageBox.critical(None, 'Error', f"Error at server {event.data_id}: {event.data}")
 
-        if message['data_id'] == TabChartController.LISTING_TYPE:
+        if event.data_id == TabChartController.LISTING_TYPE:
             return
 
-        fragment_id = message['data_id'].split('.')
-        exchange, pair = fragment_id[2], fragment_id[3]
-        if self._tickers_model.contain(f'{exchange} | {pair}'):
-            self._tickers_model.removeRow(message['data_id'])
+        # failed data unsubscribed, so it can be subscribed again and not replayed after reconnect
+        self._tickers_model.remove(f'{exchange} | {pair}')
+        self._send_unsub_message('.'.join([TabChartController.TICKER_TYPE, exchange, pair]))
 
         if self._chart_exchange == exchange and self._chart_pair == pair:
+            self._send_unsub_message('.'.join([TabChartController.CANDLES_TYPE, exchange, pair,
+                                               self._base_time_frame]))
+            self._send_unsub_message('.'.join([TabChartController.DEPTH_TYPE, exchange, pair]))
             self._clear_chart_info()
 
     # WS
     def _send_sub_message(self, data_id):
-        asyncio.run_coroutine_threadsafe(self._ws_manager.async_send_message(action='sub', data_id=data_id), self._loop)
+        if data_id in self._data_ids:
+            return
+        self._data_ids.add(data_id)
+        self._ws_manager.send_message('sub', data_id)
 
     def _send_unsub_message(self, data_id):
-        asyncio.run_coroutine_threadsafe(self._ws_manager.async_send_message(action='unsub', data_id=data_id),
-                                         self._loop)
+        if data_id not in self._data_ids:
+            return
+        self._data_ids.discard(data_id)
+        self._ws_manager.send_message('unsub', data_id)
+
+    class WSManager(QtCore.QThread, WSConsumer):
+        """
+        WS consumer for GUI. Messages go to GUI thread through dispatcher and signals.
 
-    class WSManager(QtCore.QThread):
+        Default mode: WS consumer work in this QThread with own event loop.
+        Process mode (USE_PROCESS): WS consumer work in worker process (IngestProcess), GUI read records from
+            shared memory by timer with FLUSH_RATE, so decode of heavy streams not take GIL from GUI thread.
+        """
 
+        # list of ticker MarketEvents, all tickers of one flush
         update_ticker_signal = QtCore.pyqtSignal(object)
         update_depth_signal = QtCore.pyqtSignal(object)
         update_candles_signal = QtCore.pyqtSignal(object)
         update_listing_signal = QtCore.pyqtSignal(object)
         show_error_signal = QtCore.pyqtSignal(object)
+        connection_state_signal = QtCore.pyqtSignal(str)
 
-        IS_DEBUG = False
+        # count of updates GUI per second. Between updates only last ticker and depth per data_id will be kept
+        FLUSH_RATE = UpdateDispatcher.FLUSH_RATE
 
-        ws_address = 'ws://0.0.0.0:8080/api/v1/ws'
+        # WS connection and parsing in separate process
+        USE_PROCESS = False
 
-        def __init__(self, loop):
-            super().__init__()
-            asyncio.set_event_loop(loop)
+        _instance = None
+
+        def __init__(self, loop=None, use_process=False):
+            """
+            :param loop: event loop for thread mode
+            :param use_process: if True, then WS consumer work in worker process and loop not used
+            """
+            # PyQt pass unused keyword arguments to next class in MRO, so WSConsumer initialized once
+            QtCore.QThread.__init__(self, on_event=self.publish, on_state=self.set_state)
+            if loop is not None:
+                asyncio.set_event_loop(loop)
             self._loop = loop
-            self.is_ws_connect = False
-            self.ws = None
+            self.connection_state = self.CONNECTING_STATE
+            # last listing, for tabs created after it received
+            self.listing = None
+            # None - unknown, True - server answered history request, False - request without answer,
+            # server not support history and it not requested again
+            self.is_history_supported = None
+
+            # messages from WS thread go to GUI thread through dispatcher
+            self.dispatcher = UpdateDispatcher(self._deliver,
+                                               coalesced_kinds=(TabChartController.TICKER_TYPE,
+                                                                TabChartController.DEPTH_TYPE),
+                                               rate=self.FLUSH_RATE,
+                                               batched_kinds=(TabChartController.TICKER_TYPE, ))
+            self._signals = {TabChartController.TICKER_TYPE: self.update_ticker_signal,
+                             TabChartController.DEPTH_TYPE: self.update_depth_signal,
+                             TabChartController.CANDLES_TYPE: self.update_candles_signal,
+                             TabChartController.LISTING_TYPE: self.update_listing_signal,
+                             TabChartController.ERROR_TYPE: self.show_error_signal}
+            self.connection_state_signal.connect(self._save_connection_state)
+            # latency of messages from WS receive to repaint, recorded while enabled (performance HUD)
+            self.latency = LatencyMonitor(self.dispatcher)
+
+            self._is_consuming = False
+            self._process = None
+            if use_process:
+                self._process = IngestProcess(self.ws_address)
+                # records read and delivered on one timer, dispatcher timer not needed
+                self._read_timer = QtCore.QTimer(self)
+                self._read_timer.timeout.connect(self._read_process)
+                self._read_timer.setInterval(max(int(1000 / self.FLUSH_RATE), 1))
+            else:
+                self.dispatcher.start()
+
+        @classmethod
+        def instance(cls):
+            """Return WS manager common for all tabs (create and start it on first call)"""
+            if cls._instance is None:
+                if cls.USE_PROCESS:
+                    cls._instance = cls(use_process=True)
+                else:
+                    cls._instance = cls(asyncio.new_event_loop())
+                cls._instance.start_consume()
+                # stop worker process and free shared memory on quit
+                QtWidgets.QApplication.instance().aboutToQuit.connect(cls._instance.stop_consume)
+            return cls._instance
+
+        def start_consume(self):
+            self._is_consuming = True
+            if self._process is not None:
+                self._process.start()
+                self._read_timer.start()
+            else:
+                self.start()
+
+        def stop_consume(self):
+            """Stop WS consumer (can be called again, e.g. by benchmark and on quit)"""
+            if not self._is_consuming:
+                return
+            self._is_consuming = False
+            if self._process is not None:
+                self._read_timer.stop()
+                self._process.stop()
+            else:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self.wait(2000)
+
+        def send_message(self, action, data_id):
+            """Send 'sub' or 'unsub' (thread safe)"""
+            if self._process is not None:
+                self._process.send(action, data_id)
+            else:
+                asyncio.run_coroutine_threadsafe(self.async_send_message(action=action, data_id=data_id), self._loop)
+
+        def request_history(self, data_id, before, limit):
+            """Request page of older candles (thread safe)"""
+            if self._process is not None:
+                self._process.request_history(data_id, before, limit)
+            else:
+                asyncio.run_coroutine_threadsafe(self.async_request_history(data_id, before, limit), self._loop)
+
+        def set_depth_grouping(self, multiplier=None, max_levels=None):
+            if multiplier is not None:
+                self.depth_grouping.multiplier = multiplier
+            if max_levels is not None:
+                self.depth_grouping.max_levels = max_levels
+            if self._process is not None:
+                self._process.set_depth_grouping(self.depth_grouping.multiplier, self.depth_grouping.max_levels)
+
+        def _save_connection_state(self, state):
+            self.connection_state = state
+
+        def _deliver(self, kind, message):
+            """Call in GUI thread by dispatcher"""
+            if kind == TabChartController.LISTING_TYPE:
+                self.listing = message
+            self.latency.record_events(LatencyMonitor.EMIT_STAGE, message)
+            self._signals[kind].emit(message)
+
+        def _read_process(self):
+            """Read all records of worker process and deliver them"""
+            for record in self._process.read():
+                if record[0] == IngestWorker.STATE_RECORD:
+                    self.connection_state_signal.emit(record[1])
+                else:
+                    self.latency.record_decoded(record)
+                    self.dispatcher.put(record.kind, record.data_id, record)
+            self.dispatcher.set_upstream_dropped(self._process.dropped())
+            self.dispatcher.flush()
 
         def run(self):
-            self._loop.create_task(self._async_start_consume())
+            self._loop.create_task(self.async_start_consume())
             self._loop.run_forever()
 
-        async def async_send_message(self, action, data_id):
-            if not self.is_ws_connect:
-                raise WebSocketError(code=1, message='WS is not connection')
-
-            await self.ws.send_json(
-                dict(
-                    action=action,
-                    data_id=data_id
-                )
-            )
-
-        async def _async_start_consume(self):
-            try:
-                async with ClientSession() as session:
-                    async with session.ws_connect(self.ws_address) as self.ws:
-                        self.is_ws_connect = True
-
-                        while True:
-                            response = await self.ws.receive()
-                            response = json.loads(response.data)
-
-                            if TabChartController.WSManager.IS_DEBUG:
-                                print(response)
-
-                            if 'error' in response:
-                                self.show_error_signal.emit(response)
-                            elif response['data_id'] == TabChartController.LISTING_TYPE:
-                                self.update_listing_signal.emit(response)
-                            else:
-                                data_type = response['data_id'].split('.')[1]
-                                if data_type == TabChartController.TICKER_TYPE:
-                                    self.update_ticker_signal.emit(response)
-                                elif data_type == TabChartController.CANDLES_TYPE:
-                                    self.update_candles_signal.emit(response)
-                                elif data_type == TabChartController.DEPTH_TYPE:
-                                    self.update_depth_signal.emit(response)
-            except ClientConnectorError:
-                pass
+        # callbacks of WSConsumer
+        def publish(self, event):
+            self.latency.record_decoded(event)
+            self.dispatcher.put(event.kind, event.data_id, event)
+
+        def set_state(self, state):
+            self.connection_state_signal.emit(state)
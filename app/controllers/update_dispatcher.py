@@ -0,0 +1,115 @@
+from PyQt5 import QtCore
+from collections import OrderedDict, deque
+import threading
+
+
+class UpdateDispatcher(QtCore.QObject):
+    """
+    Coalescing queue between WS thread and GUI thread.
+
+    put - thread safe, call from WS thread.
+        Messages of coalesced kinds (ticker, depth) keep only latest pending message per data_id,
+        because screen show only last state. Other messages (candles, listing, errors) keep all in order.
+    flush - call by timer in GUI thread with FLUSH_RATE per second, give all pending messages to deliver callback.
+        Latest messages of batched kinds give to deliver callback in one list per kind, so model can apply
+        them in one transaction.
+    stats - queue depth, delivered and dropped counts for monitoring (include messages dropped before queue,
+        e.g. in ingest process, that set by set_upstream_dropped).
+
+    Object must be created in GUI thread, because timer work in thread of object.
+
+    """
+
+    FLUSH_RATE = 30
+
+    def __init__(self, deliver, coalesced_kinds=(), rate=FLUSH_RATE, batched_kinds=()):
+        """
+        :param deliver: callback deliver(kind, message), call in GUI thread
+        :param coalesced_kinds: kinds of messages, for which only latest message per data_id needed
+        :param rate: count of flushes per second
+        :param batched_kinds: coalesced kinds, which delivered as deliver(kind, [message, ...]) once per flush
+        """
+        super(UpdateDispatcher, self).__init__()
+        self._deliver = deliver
+        self._coalesced_kinds = frozenset(coalesced_kinds)
+        self._batched_kinds = frozenset(batched_kinds)
+        self._lock = threading.Lock()
+        # {data_id: (kind, message), ...} - only last message for every data_id
+        self._latest = OrderedDict()
+        # [(kind, message), ...] - all messages in order
+        self._ordered = deque()
+
+        self._delivered = 0
+        self._dropped = dict()
+        self._upstream_dropped = dict()
+        self._max_depth = 0
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Set count of flushes per second"""
+        self._timer.setInterval(max(int(1000 / rate), 1))
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def put(self, kind, data_id, message):
+        """Add message in queue (thread safe)"""
+        with self._lock:
+            if kind in self._coalesced_kinds:
+                if data_id in self._latest:
+                    self._dropped[kind] = self._dropped.get(kind, 0) + 1
+                self._latest[data_id] = (kind, message)
+            else:
+                self._ordered.append((kind, message))
+            depth = len(self._latest) + len(self._ordered)
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+    def flush(self):
+        """Deliver all pending messages. Ordered messages first, then latest state of coalesced data"""
+        with self._lock:
+            if not self._latest and not self._ordered:
+                return
+            ordered, self._ordered = self._ordered, deque()
+            latest, self._latest = self._latest, OrderedDict()
+
+        for kind, message in ordered:
+            self._deliver(kind, message)
+        # {kind: [message, ...], ...}
+        batches = dict()
+        for kind, message in latest.values():
+            if kind in self._batched_kinds:
+                batches.setdefault(kind, []).append(message)
+            else:
+                self._deliver(kind, message)
+        for kind, messages in batches.items():
+            self._deliver(kind, messages)
+        self._delivered += len(ordered) + len(latest)
+
+    def set_upstream_dropped(self, dropped):
+        """Set {kind: count, ...} of messages, that replaced by newer message before queue"""
+        with self._lock:
+            self._upstream_dropped = dict(dropped)
+
+    @property
+    def queue_depth(self):
+        """Count of pending messages"""
+        with self._lock:
+            return len(self._latest) + len(self._ordered)
+
+    def stats(self):
+        """Return dict with queue depth, max queue depth, count of delivered and dropped (by kind) messages"""
+        with self._lock:
+            dropped = dict(self._dropped)
+            for kind, count in self._upstream_dropped.items():
+                dropped[kind] = dropped.get(kind, 0) + count
+            return dict(queue_depth=len(self._latest) + len(self._ordered),
+                        max_queue_depth=self._max_depth,
+                        delivered=self._delivered,
+                        dropped=dropped)
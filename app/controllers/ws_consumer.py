@@ -0,0 +1,140 @@
+from app.controllers.depth_grouping import DepthGrouping
+from app.controllers.subscriptions import SubscriptionRegistry
+from app.controllers.messages import MessageParser
+from app.controllers import messages
+from aiohttp import ClientSession, ClientError, WSMsgType
+import asyncio
+import random
+import time
+
+
+class WSConsumer:
+    """
+    WS client of server without Qt. Work in thread of event loop (WS thread or ingest process).
+
+    Keep registry of subscriptions (subscribed again after reconnect), reconnect with exponential backoff,
+    decode, normalize and group messages. Owner get results by callbacks, that called in thread of event loop:
+        on_event(event) - MarketEvent ready for GUI
+        on_state(state) - CONNECTING_STATE, CONNECTED_STATE or RECONNECTING_STATE
+    """
+
+    IS_DEBUG = False
+
+    ws_address = 'ws://0.0.0.0:8080/api/v1/ws'
+
+    # delay before reconnect doubles after every failed attempt, from min to max seconds
+    RECONNECT_MIN_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30
+
+    CONNECTING_STATE = 'connecting'
+    CONNECTED_STATE = 'connected'
+    RECONNECTING_STATE = 'reconnecting'
+
+    def __init__(self, on_event, on_state, ws_address=None):
+        """
+        :param on_event: callback on_event(event) for every MarketEvent
+        :param on_state: callback on_state(state) for every change of connection state
+        :param ws_address: address of server, if None, then ws_address of class
+        """
+        self._on_event = on_event
+        self._on_state = on_state
+        if ws_address:
+            self.ws_address = ws_address
+        self.is_ws_connect = False
+        self.ws = None
+        # decode and normalize messages in thread of consumer
+        self._parser = MessageParser()
+        self.depth_grouping = DepthGrouping()
+        # active data_id with count of consumers, will be subscribed again after reconnect.
+        # Change only in thread of event loop
+        self._subscriptions = SubscriptionRegistry()
+
+    async def async_send_message(self, action, data_id):
+        """
+        Count consumer in registry and send message, if it first 'sub' or last 'unsub' of data_id and connected.
+
+        If WS not connected, message will be sent after connect by registry.
+
+        """
+        if action == 'sub' and not self._subscriptions.add(data_id):
+            return
+        if action == 'unsub' and not self._subscriptions.remove(data_id):
+            return
+
+        if not self.is_ws_connect:
+            return
+        try:
+            await self.ws.send_json(
+                dict(
+                    action=action,
+                    data_id=data_id
+                )
+            )
+        except (ClientError, ConnectionError, RuntimeError):
+            # socket closed, consumer will reconnect and replay subscriptions
+            pass
+
+    async def async_request_history(self, data_id, before, limit):
+        """Request page of candles of data_id older than time before. Request lost, if WS not connected"""
+        if not self.is_ws_connect:
+            return
+        try:
+            await self.ws.send_json(
+                dict(
+                    action=messages.HISTORY_ACTION,
+                    data_id=data_id,
+                    before=before,
+                    limit=limit
+                )
+            )
+        except (ClientError, ConnectionError, RuntimeError):
+            pass
+
+    async def async_start_consume(self):
+        """Consume messages and reconnect with exponential backoff and jitter, if connection lost"""
+        delay = self.RECONNECT_MIN_DELAY
+        self._on_state(self.CONNECTING_STATE)
+        while True:
+            try:
+                async with ClientSession() as session:
+                    async with session.ws_connect(self.ws_address) as self.ws:
+                        self.is_ws_connect = True
+                        delay = self.RECONNECT_MIN_DELAY
+                        self._on_state(self.CONNECTED_STATE)
+                        # replay subscriptions, server will send 'starting' candles again
+                        for data_id in self._subscriptions.data_ids():
+                            await self.ws.send_json(dict(action='sub', data_id=data_id))
+
+                        await self._async_consume()
+            except (ClientError, ConnectionError, asyncio.TimeoutError):
+                pass
+            finally:
+                self.is_ws_connect = False
+
+            self._on_state(self.RECONNECTING_STATE)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.))
+            delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+
+    async def _async_consume(self):
+        """Read messages until socket closed"""
+        while True:
+            response = await self.ws.receive()
+            received = time.perf_counter()
+            if response.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+                return
+            try:
+                event = self._parser.parse(response.data)
+            except (ValueError, KeyError, IndexError, TypeError):
+                # broken message must not stop consumer
+                continue
+
+            if self.IS_DEBUG:
+                print(event)
+
+            if event is None:
+                continue
+            data = event.data
+            if event.kind == messages.DEPTH_TYPE:
+                # GUI get only grouped and cut depth
+                data = self.depth_grouping.apply(event.data_id, *event.data)
+            self._on_event(event._replace(data=data, received=received, decoded=time.perf_counter()))
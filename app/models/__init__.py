@@ -1,5 +1,9 @@
 from .chart_item.stock_price_series import StockPriceSeries
 from .chart_item.volume_series import VolumeSeries
 from .chart_item.time_axis import CustomAxisItem
+from .chart_item.candle_store import CandleStore
+from .chart_item.indicators import Indicator, SMA, EMA, Bollinger, RSI, VWAP
+from .chart_item.indicator_series import IndicatorSeries
+from .candle_cache import CandleCache
 from .tickers_model import TickerTableModel
 from .depth_models import DepthTableModel
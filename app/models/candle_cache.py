@@ -0,0 +1,115 @@
+import numpy as np
+import sqlite3
+import os
+
+
+class CandleCache:
+    """
+    Persistent cache of candles in SQLite, key - (exchange, pair, time_frame).
+
+    Candle in format [open, high, low, close, volume, time].
+    load - return cached candles, so chart can be shown before 'starting' message from server.
+    merge - return cached candles older than server candles + server candles.
+    load_before - return page of cached candles older than time (history for scroll to left).
+    put - save candles in memory buffer, flush - write buffer in one transaction.
+        Updates of last candle come many times per second, so only last version of every candle is kept in buffer
+        and written by flush (controller call it by timer and before quit).
+
+    Connection must be used only from one thread (GUI thread).
+
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cryptocurrency_quotes', 'candles.sqlite3')
+
+    # max count of candles, that load return (newest)
+    LOAD_LIMIT = 100000
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        :param path: path to SQLite file, ':memory:' for cache without disk
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS candles ('
+            'exchange TEXT, pair TEXT, time_frame TEXT, time INTEGER, '
+            'open REAL, high REAL, low REAL, close REAL, volume REAL, '
+            'PRIMARY KEY (exchange, pair, time_frame, time)) WITHOUT ROWID'
+        )
+        self._connection.commit()
+        # {(exchange, pair, time_frame, time): row, ...} - last version of not written candles
+        self._pending = dict()
+
+    def load(self, exchange, pair, time_frame, limit=LOAD_LIMIT):
+        """Return np.ndarray with rows [open, high, low, close, volume, time] sorted by time (include not flushed)"""
+        rows = self._connection.execute(
+            'SELECT open, high, low, close, volume, time FROM candles '
+            'WHERE exchange = ? AND pair = ? AND time_frame = ? ORDER BY time DESC LIMIT ?',
+            (exchange, pair, time_frame, limit)
+        ).fetchall()
+        candles = np.array(rows[::-1], dtype=np.float64).reshape(-1, 6)
+
+        pending = [row for key, row in self._pending.items() if key[:3] == (exchange, pair, time_frame)]
+        if pending:
+            candles = self._combine(candles, np.array(pending, dtype=np.float64).reshape(-1, 6))
+        return candles[-limit:]
+
+    def load_before(self, exchange, pair, time_frame, before, limit):
+        """Return up to limit newest candles older than time before, sorted by time (include not flushed)"""
+        rows = self._connection.execute(
+            'SELECT open, high, low, close, volume, time FROM candles '
+            'WHERE exchange = ? AND pair = ? AND time_frame = ? AND time < ? ORDER BY time DESC LIMIT ?',
+            (exchange, pair, time_frame, int(before), limit)
+        ).fetchall()
+        candles = np.array(rows[::-1], dtype=np.float64).reshape(-1, 6)
+
+        pending = [row for key, row in self._pending.items()
+                   if key[:3] == (exchange, pair, time_frame) and key[3] < before]
+        if pending:
+            candles = self._combine(candles, np.array(pending, dtype=np.float64).reshape(-1, 6))
+        return candles[len(candles) - min(len(candles), limit):]
+
+    def merge(self, exchange, pair, time_frame, candles, limit=LOAD_LIMIT):
+        """
+        Save server candles and return them with older cached candles.
+
+        :param candles: candles from 'starting' message, sorted by time
+        :param limit: max count of last cached candles
+        """
+        candles = np.asarray(candles, dtype=np.float64).reshape(-1, 6)
+        cached = self.load(exchange, pair, time_frame, limit)
+        self.put(exchange, pair, time_frame, candles)
+        if not len(candles):
+            return cached
+        return np.concatenate((cached[cached[:, 5] < candles[0, 5]], candles))
+
+    def put(self, exchange, pair, time_frame, candles):
+        """Add candles (one candle or array of candles) in buffer for next flush"""
+        for row in np.asarray(candles, dtype=np.float64).reshape(-1, 6).tolist():
+            self._pending[(exchange, pair, time_frame, int(row[5]))] = row
+
+    def flush(self):
+        """Write all buffered candles in one transaction"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, dict()
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO candles (exchange, pair, time_frame, time, open, high, low, close, volume) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key + tuple(row[:5]) for key, row in pending.items())
+            )
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    @staticmethod
+    def _combine(old, new):
+        """Return candles of old and new sorted by time, for equal time candle from new"""
+        old = old[~np.isin(old[:, 5], new[:, 5])]
+        candles = np.concatenate((old, new))
+        return candles[np.argsort(candles[:, 5], kind='stable')]
@@ -1,3 +1,6 @@
 from .stock_price_series import StockPriceSeries, ChartTypeError
 from .volume_series import VolumeSeries
 from .time_axis import CustomAxisItem
+from .candle_store import CandleStore
+from .indicators import Indicator, SMA, EMA, Bollinger, RSI, VWAP
+from .indicator_series import IndicatorSeries
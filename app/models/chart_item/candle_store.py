@@ -0,0 +1,265 @@
+from pyqtgraph import QtCore
+from .range_index import RangeIndex
+import numpy as np
+
+
+class CandleStore(QtCore.QObject):
+    """
+    Columnar storage of candles shared by chart items.
+
+    Candle in format [open, high, low, close, volume, time].
+        open, high, low, close, volume - stored in float64 columns
+        time - unix-time, stored in int64 column
+    Capacity doubles when storage is full, so append is amortized O(1).
+    Candles indexed by time (dict time -> sequence number), so append_or_replace is O(1). Index of candle is
+    sequence number - sequence number of first candle, so prepend and trim do not change keys of index.
+    Max of high, min of low, min and max of close and max of volume on any range
+    can get by range_max/range_min in O(log n) (segment trees updated on every change).
+    Properties open, high, low, close, volume, time return views without copy. Views are valid until next
+    append, because growing reallocates columns, so chart items must not keep them.
+    If max_count set, then memory is bounded: when count of candles exceed max_count by trim batch, oldest candles
+    removed and indexes of other candles decrease. Candles removed by batches (1/TRIM_FRACTION of max_count),
+    so cost of trim is amortized O(1) for append and columns stay contiguous for vectorized paint.
+    Older candles (pages of history) can be added before first candle by prepend.
+
+    reset_signal - emit after set_data/clear
+    candle_changed_signal(index, is_new) - emit after append or replace candle
+    trimmed_signal(count) - emit after count oldest candles removed
+    prepended_signal(count) - emit after count older candles added before first candle
+
+    """
+
+    reset_signal = QtCore.pyqtSignal()
+    candle_changed_signal = QtCore.pyqtSignal(int, bool)
+    trimmed_signal = QtCore.pyqtSignal(int)
+    prepended_signal = QtCore.pyqtSignal(int)
+
+    INITIAL_CAPACITY = 1024
+    TRIM_FRACTION = 16
+
+    OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+    # columns and queries with range index
+    INDEXED = ((HIGH, RangeIndex.MAX), (LOW, RangeIndex.MIN), (CLOSE, RangeIndex.MAX), (CLOSE, RangeIndex.MIN),
+               (VOLUME, RangeIndex.MAX))
+
+    def __init__(self, data=None, capacity=INITIAL_CAPACITY, max_count=None):
+        """
+        :param data: starting candles in format [[open, high, low, close, volume, time], [...], ...]
+        :param capacity: starting count of candles, that can be saved without reallocation
+        :param max_count: count of last candles, that kept in memory, if None, then history not bounded
+        """
+        super(CandleStore, self).__init__()
+        self._max_count = max_count
+        self._count = 0
+        self._ohlcv = np.empty((5, capacity), dtype=np.float64)
+        self._time = np.empty(capacity, dtype=np.int64)
+        # {time: sequence number, ...}
+        self._index = dict()
+        # sequence number of first candle
+        self._first = 0
+        # {(column, kind): RangeIndex, ...}
+        self._range_index = {key: RangeIndex(key[1]) for key in CandleStore.INDEXED}
+        if data is not None:
+            self.set_data(data)
+
+    def _reserve(self, count):
+        """Grow columns (doubling capacity) until count candles fit"""
+        capacity = self._time.shape[0]
+        if count <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < count:
+            capacity *= 2
+        ohlcv = np.empty((5, capacity), dtype=np.float64)
+        ohlcv[:, :self._count] = self._ohlcv[:, :self._count]
+        time = np.empty(capacity, dtype=np.int64)
+        time[:self._count] = self._time[:self._count]
+        self._ohlcv, self._time = ohlcv, time
+
+    def set_data(self, data):
+        """Replace all candles. data - candles in format [[open, high, low, close, volume, time], [...], ...]"""
+        rows = np.asarray(data, dtype=np.float64).reshape(-1, 6)
+        if self._max_count is not None:
+            rows = rows[len(rows) - min(len(rows), self._max_count):]
+        self._count = 0
+        self._reserve(len(rows))
+        self._ohlcv[:, :len(rows)] = rows[:, :5].T
+        self._time[:len(rows)] = rows[:, 5]
+        self._count = len(rows)
+        self._first = 0
+        self._index = dict(zip(self.time.tolist(), range(self._count)))
+        self._build_range_index()
+        self.reset_signal.emit()
+
+    def _build_range_index(self):
+        for (column, kind), range_index in self._range_index.items():
+            range_index.build(self._ohlcv[column, :self._count])
+
+    @property
+    def max_count(self):
+        return self._max_count
+
+    @max_count.setter
+    def max_count(self, max_count):
+        """Change limit of memory, candles over lower limit removed by next append"""
+        self._max_count = max_count
+
+    def _trim(self):
+        """Remove oldest candles, if count exceed max_count by trim batch. Return count of removed candles"""
+        if self._max_count is None or self._count <= self._max_count + self._max_count // self.TRIM_FRACTION:
+            return 0
+        count = self._count - self._max_count
+        for time in self._time[:count].tolist():
+            self._index.pop(time, None)
+        self._ohlcv[:, :self._max_count] = self._ohlcv[:, count:self._count]
+        self._time[:self._max_count] = self._time[count:self._count]
+        self._count = self._max_count
+        self._first += count
+        self._build_range_index()
+        self.trimmed_signal.emit(count)
+        return count
+
+    def prepend(self, data):
+        """
+        Add candles older than first candle before it. Return count of added candles.
+
+        Candles not older than first candle skipped. If max_count set, then only newest candles added,
+        that fit in max_count (history in memory not grow over limit).
+
+        """
+        rows = np.asarray(data, dtype=np.float64).reshape(-1, 6)
+        if self._count:
+            rows = rows[rows[:, 5] < self._time[0]]
+        rows = rows[np.argsort(rows[:, 5], kind='stable')]
+        # one candle for every time
+        rows = rows[np.concatenate((rows[1:, 5] != rows[:-1, 5], [True]))] if len(rows) else rows
+        if self._max_count is not None:
+            rows = rows[len(rows) - min(len(rows), max(self._max_count - self._count, 0)):]
+        count = len(rows)
+        if not count:
+            return 0
+
+        self._reserve(self._count + count)
+        # shift candles right (numpy copy overlapped ranges correctly) and write older candles before them
+        self._ohlcv[:, count:count + self._count] = self._ohlcv[:, :self._count]
+        self._ohlcv[:, :count] = rows[:, :5].T
+        self._time[count:count + self._count] = self._time[:self._count]
+        self._time[:count] = rows[:, 5]
+        self._count += count
+        self._first -= count
+        self._index.update(zip(self._time[:count].tolist(), range(self._first, self._first + count)))
+        self._build_range_index()
+        self.prepended_signal.emit(count)
+        return count
+
+    def clear(self):
+        self._count = 0
+        self._first = 0
+        self._index = dict()
+        for range_index in self._range_index.values():
+            range_index.build([])
+        self.reset_signal.emit()
+
+    def _write(self, index, candle):
+        time = int(candle[5])
+        if index < self._count and self._time[index] != time:
+            self._index.pop(int(self._time[index]), None)
+        values = [float(value) for value in candle[:5]]
+        self._ohlcv[:, index] = values
+        self._time[index] = time
+        self._index[time] = index + self._first
+        for (column, kind), range_index in self._range_index.items():
+            range_index.set(index, values[column])
+
+    def append(self, candle):
+        """Append candle to end, oldest candles can be removed after it. Return index of candle"""
+        self._reserve(self._count + 1)
+        self._write(self._count, candle)
+        self._count += 1
+        self.candle_changed_signal.emit(self._count - 1, True)
+        self._trim()
+        return self._count - 1
+
+    def replace(self, index, candle):
+        self._write(index, candle)
+        self.candle_changed_signal.emit(index, False)
+
+    def find(self, time):
+        """Return index of candle with this time or -1"""
+        sequence = self._index.get(int(time))
+        return -1 if sequence is None else sequence - self._first
+
+    def append_or_replace(self, candle):
+        """
+        Append new candle or replace old candle by time.
+
+        if 'time' already contain in data set, then replace. Return index of candle.
+        Update almost always for last or next candle, so check it before search in index.
+        Candle older than last candle, that not contain in store (trimmed or missed), not added, because
+        candles must stay sorted by time, return -1.
+
+        """
+        time = int(candle[5])
+        last = self._count - 1
+        if last >= 0 and self._time[last] == time:
+            index = last
+        elif last < 0 or self._time[last] < time:
+            return self.append(candle)
+        else:
+            # correction of old candle
+            index = self.find(time)
+            if index == -1:
+                return -1
+        self.replace(index, candle)
+        return index
+
+    def range_max(self, column, start=0, stop=None):
+        """Return max of column (HIGH, CLOSE or VOLUME) on candles [start, stop) or None for empty range"""
+        return self._range_query(column, RangeIndex.MAX, start, stop)
+
+    def range_min(self, column, start=0, stop=None):
+        """Return min of column (LOW or CLOSE) on candles [start, stop) or None for empty range"""
+        return self._range_query(column, RangeIndex.MIN, start, stop)
+
+    def _range_query(self, column, kind, start, stop):
+        stop = self._count if stop is None else min(stop, self._count)
+        start = max(start, 0)
+        if start >= stop:
+            return None
+        return self._range_index[(column, kind)].query(start, stop)
+
+    @property
+    def open(self):
+        return self._ohlcv[CandleStore.OPEN, :self._count]
+
+    @property
+    def high(self):
+        return self._ohlcv[CandleStore.HIGH, :self._count]
+
+    @property
+    def low(self):
+        return self._ohlcv[CandleStore.LOW, :self._count]
+
+    @property
+    def close(self):
+        return self._ohlcv[CandleStore.CLOSE, :self._count]
+
+    @property
+    def volume(self):
+        return self._ohlcv[CandleStore.VOLUME, :self._count]
+
+    @property
+    def time(self):
+        return self._time[:self._count]
+
+    def __getitem__(self, item):
+        """Return candle in format (open, high, low, close, volume, time)"""
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError('candle index out of range')
+        return tuple(self._ohlcv[:, item].tolist()) + (int(self._time[item]),)
+
+    def __len__(self):
+        return self._count
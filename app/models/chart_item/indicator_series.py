@@ -0,0 +1,138 @@
+from pyqtgraph import QtCore, QtGui
+import pyqtgraph as pg
+from .segmented_picture import SegmentedPicture
+from . import lod, primitives
+import numpy as np
+
+
+class IndicatorSeries(pg.GraphicsObject):
+    """
+    Lines of Indicator. Painted over StockPriceSeries (same x coord) or on own chart.
+
+    Item repaint self after every change of indicator: only chunks with changed values, like StockPriceSeries.
+    Values NaN (not enough candles for indicator) not painted.
+
+    """
+
+    def __init__(self, indicator, color='r', width=1):
+        """
+        :param indicator: Indicator, that calculated from CandleStore
+        :param color: color of all lines of indicator
+        :param width: width of lines
+        """
+        super(IndicatorSeries, self).__init__()
+        self._indicator = indicator
+        self._color = color
+        self._width = width
+        self._picture = SegmentedPicture(self._paint_range)
+        # cache of thinned picture for zoomed out chart
+        self._lod_picture = None
+        self._lod_key = None
+        # (min, max) of all values for bounding rect, only expand on change
+        self._bounds = (None, None)
+        self._indicator.reset_signal.connect(self.update_picture)
+        self._indicator.changed_signal.connect(self._value_changed_slot)
+        self.update_picture()
+
+    @property
+    def indicator(self):
+        return self._indicator
+
+    def _value_changed_slot(self, index, is_new):
+        if is_new:
+            self._picture.append()
+        else:
+            self._picture.invalidate(index)
+            # line segment to next point depend from this value
+            self._picture.invalidate(index + 1)
+        minimum, maximum = self._range(index, index + 1)
+        if minimum is not None and (self._bounds[0] is None or minimum < self._bounds[0]
+                                    or maximum > self._bounds[1]):
+            self.prepareGeometryChange()
+            if self._bounds[0] is not None:
+                minimum, maximum = min(minimum, self._bounds[0]), max(maximum, self._bounds[1])
+            self._bounds = (minimum, maximum)
+        self._lod_key = None
+        self.update()
+
+    def _paint_lines(self, pen, positions, values):
+        """Paint every line (row of values) by polylines through finite values"""
+        pen.setPen(self._pen)
+        for line in values:
+            is_finite = np.isfinite(line)
+            if is_finite.all():
+                pen.drawPolyline(primitives.polyline(positions, line))
+                continue
+            # split line on runs of finite values
+            edges = np.flatnonzero(np.diff(np.concatenate(([False], is_finite, [False])).astype(np.int8)))
+            for start, stop in zip(edges[::2], edges[1::2]):
+                if stop - start > 1:
+                    pen.drawPolyline(primitives.polyline(positions[start:stop], line[start:stop]))
+
+    def _paint_range(self, pen, start, stop):
+        """Paint line segments of points [start, stop), every segment belongs to his right point"""
+        start = max(start - 1, 0)
+        self._paint_lines(pen, np.arange(start, stop, dtype=np.float64),
+                          self._indicator.drawn_values()[:, start:stop])
+
+    def _get_decimated_picture(self, start, stop, factor):
+        """Return QPicture() with every factor point of visible lines (cached until data change)"""
+        start = lod.align_start(start, factor)
+        key = (start, stop, factor)
+        if self._lod_key != key:
+            self._lod_picture = QtGui.QPicture()
+            pen = QtGui.QPainter(self._lod_picture)
+            self._paint_lines(pen, np.arange(start, stop, factor, dtype=np.float64),
+                              self._indicator.drawn_values()[:, start:stop:factor])
+            pen.end()
+            self._lod_key = key
+        return self._lod_picture
+
+    def update_picture(self):
+        """Repaint all picture"""
+        self._pen = pg.mkPen(self._color, width=self._width)
+        self._picture.rebuild(len(self._indicator))
+        self._lod_key = None
+        self.prepareGeometryChange()
+        self._bounds = self._range()
+        self.update()
+
+    def paint(self, p, *args):
+        """Paint only visible points, thinned if some points in one pixel"""
+        start, stop = lod.visible_range(self.getViewBox(), len(self._indicator))
+        factor = lod.decimation_factor(self)
+        if factor > 1 and start < stop:
+            p.drawPicture(0, 0, self._get_decimated_picture(start, stop, factor))
+        else:
+            self._picture.paint(p, start, stop)
+
+    def _range(self, start=0, stop=None):
+        """Return (min, max) of finite values [start, stop) or (None, None)"""
+        values = self._indicator.drawn_values()[:, start:stop]
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return None, None
+        return float(values.min()), float(values.max())
+
+    def boundingRect(self):
+        minimum, maximum = self._bounds
+        if minimum is None:
+            return self._picture.bounding_rect()
+        return QtCore.QRectF(-1., minimum, len(self._indicator) + 2., maximum - minimum)
+
+    def dataBounds(self, ax=None, frac=1.0, orthoRange=None):
+        """For auto-scaling"""
+        count = len(self._indicator)
+        if not count or self.getViewBox() is None:
+            return None, None
+
+        view_range = self.getViewBox().viewRange()
+        # +-1 for extra indent
+        left, right = int(view_range[0][0]) - 1, int(view_range[0][1]) + 1
+        left, right = max(left, 0), min(right, count)
+        if left >= right:
+            return None, None
+        return self._range(left, right)
+
+    def __len__(self):
+        return len(self._indicator)
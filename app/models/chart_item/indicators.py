@@ -0,0 +1,339 @@
+"""
+Technical indicators calculated from CandleStore.
+
+Indicator calculated vectorized for all candles after reset of store ('starting' message, new time frame)
+and incrementally for last candle after every append or replace: value of last candle depend only from values
+of previous candle (rolling state) and last candles of store, so update do not depend from length of history.
+Replace of last candle calculated again from values of previous candle, so live candle never counted twice.
+Correction of older candle change all next values, then indicator calculated again from scratch.
+"""
+from pyqtgraph import QtCore
+from .candle_store import CandleStore
+import numpy as np
+
+
+# count of decimal digits, that decay of EMA can lose in one block of vectorized calculation
+EMA_BLOCK_DIGITS = 30
+
+SECONDS_IN_DAY = 86400
+
+
+def rolling_mean(values, period):
+    """Return mean of every window with period values, NaN for first period - 1 values"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= period:
+        sums = np.cumsum(np.concatenate(([0.], values)))
+        result[period - 1:] = (sums[period:] - sums[:-period]) / period
+    return result
+
+
+def rolling_std(values, period):
+    """Return standard deviation of every window with period values, NaN for first period - 1 values"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= period:
+        # shift to first value, so sum of squares do not lose precision on big prices
+        shifted = values - values[0]
+        mean = rolling_mean(shifted, period)[period - 1:]
+        mean_square = rolling_mean(shifted * shifted, period)[period - 1:]
+        result[period - 1:] = np.sqrt(np.maximum(mean_square - mean * mean, 0.))
+    return result
+
+
+def ema(values, alpha):
+    """
+    Return exponential moving average y[i] = alpha * x[i] + (1 - alpha) * y[i - 1], y[0] = x[0].
+
+    Recursion unrolled in closed form by blocks: inside block y[j] = decay^j * (decay * y[-1] +
+    alpha * sum(x[k] / decay^k)), length of block limited, so decay^j do not underflow.
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    decay = 1. - alpha
+    if not len(values) or decay <= 0:
+        return values.copy()
+    block = max(1, int(EMA_BLOCK_DIGITS / -np.log10(decay)))
+    powers = decay ** np.arange(min(block, len(values)))
+    result = np.empty(len(values))
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        scale = powers[:len(chunk)]
+        result[start:start + len(chunk)] = scale * (decay * previous + alpha * np.cumsum(chunk / scale))
+        previous = result[start + len(chunk) - 1]
+    return result
+
+
+class Indicator(QtCore.QObject):
+    """
+    Base class of indicator.
+
+    Values saved in array with row for every line in LINES. First DRAWN_LINES lines painted on chart,
+    other lines - rolling state for incremental calculation. Capacity doubles like in CandleStore.
+
+    Subclass must implement:
+        _compute_all(store) - list of arrays for every line, calculated for all candles
+        _compute_last(index) - tuple with value of every line for candle with index, calculated from
+            values of previous candle
+
+    reset_signal - emit after values of all candles changed (calculated again or shifted after trim of store)
+    changed_signal(index, is_new) - emit after value appended or replaced
+
+    """
+
+    reset_signal = QtCore.pyqtSignal()
+    changed_signal = QtCore.pyqtSignal(int, bool)
+
+    LINES = ('value', )
+    DRAWN_LINES = 1
+    # if True, then indicator painted over price chart, else on own chart
+    IS_OVERLAY = True
+
+    def __init__(self, store=None):
+        """
+        :param store: CandleStore with candles, if None, then will create empty store
+        """
+        super(Indicator, self).__init__()
+        self._store = None
+        self._count = 0
+        self._values = np.empty((len(self.LINES), CandleStore.INITIAL_CAPACITY))
+        self.set_store(store if store is not None else CandleStore())
+
+    @property
+    def title(self):
+        return type(self).__name__
+
+    def set_store(self, store):
+        """Calculate indicator from other CandleStore. If store is None, then indicator disconnected from store"""
+        if self._store is not None:
+            self._store.reset_signal.disconnect(self._store_reset_slot)
+            self._store.candle_changed_signal.disconnect(self._candle_changed_slot)
+            self._store.trimmed_signal.disconnect(self._store_trimmed_slot)
+            self._store.prepended_signal.disconnect(self._store_prepended_slot)
+        self._store = store
+        if store is not None:
+            self._store.reset_signal.connect(self._store_reset_slot)
+            self._store.candle_changed_signal.connect(self._candle_changed_slot)
+            self._store.trimmed_signal.connect(self._store_trimmed_slot)
+            self._store.prepended_signal.connect(self._store_prepended_slot)
+            self._store_reset_slot()
+
+    @property
+    def store(self):
+        return self._store
+
+    def _reserve(self, count):
+        capacity = self._values.shape[1]
+        if count <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < count:
+            capacity *= 2
+        values = np.empty((len(self.LINES), capacity))
+        values[:, :self._count] = self._values[:, :self._count]
+        self._values = values
+
+    def _store_reset_slot(self):
+        """Calculate values for all candles"""
+        count = len(self._store)
+        self._count = 0
+        self._reserve(count)
+        if count:
+            self._values[:, :count] = self._compute_all(self._store)
+        self._count = count
+        self.reset_signal.emit()
+
+    def _store_trimmed_slot(self, count):
+        """Oldest candles removed from store, values of other candles not changed, only shifted"""
+        count = min(count, self._count)
+        self._values[:, :self._count - count] = self._values[:, count:self._count]
+        self._count -= count
+        self.reset_signal.emit()
+
+    def _store_prepended_slot(self, count):
+        """Older candles added, values of rolling indicators depend from all history, so calculated again"""
+        self._store_reset_slot()
+
+    def _candle_changed_slot(self, index, is_new):
+        """Calculate value of appended or replaced last candle, older candle change all next values"""
+        if index < len(self._store) - 1 or index > self._count:
+            self._store_reset_slot()
+            return
+        if is_new:
+            self._reserve(index + 1)
+            self._count = index + 1
+        self._values[:, index] = self._compute_last(index)
+        self.changed_signal.emit(index, is_new)
+
+    def _compute_all(self, store):
+        raise NotImplementedError
+
+    def _compute_last(self, index):
+        raise NotImplementedError
+
+    def values(self, line=0):
+        """Return view of values of line without copy. View valid until next append"""
+        return self._values[line, :self._count]
+
+    def drawn_values(self):
+        """Return view of values of all painted lines in shape (DRAWN_LINES, count)"""
+        return self._values[:self.DRAWN_LINES, :self._count]
+
+    def __len__(self):
+        return self._count
+
+
+class SMA(Indicator):
+    """Simple moving average of close price. Update cost O(period)"""
+
+    def __init__(self, period=20, store=None):
+        self.period = period
+        super(SMA, self).__init__(store)
+
+    @property
+    def title(self):
+        return f'SMA {self.period}'
+
+    def _compute_all(self, store):
+        return [rolling_mean(store.close, self.period)]
+
+    def _compute_last(self, index):
+        if index + 1 < self.period:
+            return np.nan,
+        return self._store.close[index + 1 - self.period:index + 1].mean(),
+
+
+class EMA(Indicator):
+    """Exponential moving average of close price, alpha = 2 / (period + 1)"""
+
+    def __init__(self, period=50, store=None):
+        self.period = period
+        self.alpha = 2. / (period + 1)
+        super(EMA, self).__init__(store)
+
+    @property
+    def title(self):
+        return f'EMA {self.period}'
+
+    def _compute_all(self, store):
+        return [ema(store.close, self.alpha)]
+
+    def _compute_last(self, index):
+        close = self._store.close[index]
+        if index == 0:
+            return close,
+        return self.alpha * close + (1. - self.alpha) * self._values[0, index - 1],
+
+
+class Bollinger(Indicator):
+    """Bollinger bands: SMA of close and SMA +- deviations * standard deviation. Update cost O(period)"""
+
+    LINES = ('middle', 'upper', 'lower')
+    DRAWN_LINES = 3
+
+    def __init__(self, period=20, deviations=2., store=None):
+        self.period = period
+        self.deviations = deviations
+        super(Bollinger, self).__init__(store)
+
+    @property
+    def title(self):
+        return f'Bollinger {self.period}, {self.deviations:g}'
+
+    def _compute_all(self, store):
+        middle = rolling_mean(store.close, self.period)
+        width = self.deviations * rolling_std(store.close, self.period)
+        return [middle, middle + width, middle - width]
+
+    def _compute_last(self, index):
+        if index + 1 < self.period:
+            return np.nan, np.nan, np.nan
+        window = self._store.close[index + 1 - self.period:index + 1]
+        middle, width = window.mean(), self.deviations * window.std()
+        return middle, middle + width, middle - width
+
+
+class RSI(Indicator):
+    """Relative strength index with Wilder smoothing (alpha = 1 / period) of gains and losses"""
+
+    LINES = ('rsi', 'average_gain', 'average_loss')
+    IS_OVERLAY = False
+
+    def __init__(self, period=14, store=None):
+        self.period = period
+        self.alpha = 1. / period
+        super(RSI, self).__init__(store)
+
+    @property
+    def title(self):
+        return f'RSI {self.period}'
+
+    @staticmethod
+    def _rsi(average_gain, average_loss):
+        total = average_gain + average_loss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, 100. * average_gain / total, 50.)
+
+    def _compute_all(self, store):
+        count = len(store)
+        average_gain, average_loss = np.full(count, np.nan), np.full(count, np.nan)
+        if count > 1:
+            change = np.diff(store.close)
+            average_gain[1:] = ema(np.maximum(change, 0.), self.alpha)
+            average_loss[1:] = ema(np.maximum(-change, 0.), self.alpha)
+        rsi = self._rsi(average_gain, average_loss)
+        rsi[:self.period] = np.nan
+        return [rsi, average_gain, average_loss]
+
+    def _compute_last(self, index):
+        if index == 0:
+            return np.nan, np.nan, np.nan
+        change = self._store.close[index] - self._store.close[index - 1]
+        gain, loss = max(change, 0.), max(-change, 0.)
+        if index > 1:
+            gain = self.alpha * gain + (1. - self.alpha) * self._values[1, index - 1]
+            loss = self.alpha * loss + (1. - self.alpha) * self._values[2, index - 1]
+        rsi = float(self._rsi(gain, loss)) if index >= self.period else np.nan
+        return rsi, gain, loss
+
+
+class VWAP(Indicator):
+    """
+    Volume weighted average of typical price (high + low + close) / 3, accumulated from start of UTC day.
+
+    On time frames from one day every candle start new day, so VWAP equal typical price.
+
+    """
+
+    LINES = ('vwap', 'price_volume', 'volume')
+
+    @staticmethod
+    def _typical(store, index=slice(None)):
+        return (store.high[index] + store.low[index] + store.close[index]) / 3.
+
+    @staticmethod
+    def _vwap(typical, price_volume, volume):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(volume > 0, price_volume / volume, typical)
+
+    def _compute_all(self, store):
+        typical = self._typical(store)
+        price_volume = typical * store.volume
+        days = store.time // SECONDS_IN_DAY
+        is_first = np.concatenate(([True], days[1:] != days[:-1]))
+        starts = np.flatnonzero(is_first)
+        # index of day for every candle
+        day = np.cumsum(is_first) - 1
+
+        cum_price_volume, cum_volume = np.cumsum(price_volume), np.cumsum(store.volume)
+        cum_price_volume -= (cum_price_volume[starts] - price_volume[starts])[day]
+        cum_volume -= (cum_volume[starts] - store.volume[starts])[day]
+        return [self._vwap(typical, cum_price_volume, cum_volume), cum_price_volume, cum_volume]
+
+    def _compute_last(self, index):
+        store = self._store
+        typical = self._typical(store, index)
+        price_volume, volume = typical * store.volume[index], store.volume[index]
+        if index > 0 and store.time[index] // SECONDS_IN_DAY == store.time[index - 1] // SECONDS_IN_DAY:
+            price_volume += self._values[1, index - 1]
+            volume += self._values[2, index - 1]
+        return float(self._vwap(typical, price_volume, volume)), price_volume, volume
@@ -0,0 +1,44 @@
+"""Helpers for viewport culling and level-of-detail decimation of chart series"""
+import numpy as np
+import math
+
+
+def visible_range(view_box, count):
+    """Return [start, stop) of item indexes visible on view box (+-1 for extra indent)"""
+    if view_box is None:
+        return 0, count
+    view_range = view_box.viewRange()
+    left, right = int(view_range[0][0]) - 1, int(view_range[0][1]) + 2
+    return min(max(left, 0), count), min(max(right, 0), count)
+
+
+def decimation_factor(item):
+    """Return count of bars in one screen pixel or 1 if bar wider than pixel"""
+    pixel_width = item.pixelWidth()
+    if not pixel_width or pixel_width <= 1:
+        return 1
+    return int(math.ceil(pixel_width))
+
+
+def align_start(start, factor):
+    """Align first index to multiple of factor, so groups do not jump while scrolling"""
+    return start - start % factor
+
+
+def group_centers(start, count, factor):
+    """Return x coord of center for every group of factor bars"""
+    first = np.arange(0, count, factor)
+    last = np.minimum(first + factor, count) - 1
+    return start + (first + last) / 2.
+
+
+def decimate_ohlc(opens, highs, lows, closes, factor):
+    """Aggregate every factor bars in one: first open, max high, min low, last close"""
+    first = np.arange(0, len(opens), factor)
+    last = np.minimum(first + factor, len(opens)) - 1
+    return (opens[first], np.maximum.reduceat(highs, first), np.minimum.reduceat(lows, first), closes[last])
+
+
+def decimate_sum(values, factor):
+    """Aggregate every factor values in one by sum"""
+    return np.add.reduceat(values, np.arange(0, len(values), factor))
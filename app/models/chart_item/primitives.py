@@ -0,0 +1,23 @@
+"""
+Build lists of Qt primitives from NumPy arrays, so many figures of one color paint by one draw call.
+
+QPainter.drawLines/drawRects/drawPolyline used instead of QPainterPath, because fill and stroke of path
+with many sub-paths is very slow under chart transform.
+"""
+from pyqtgraph import QtCore, QtGui
+
+
+def segments(x0, y0, x1, y1):
+    """Return list of QLineF (x0, y0) -> (x1, y1) for QPainter.drawLines"""
+    return [QtCore.QLineF(*line) for line in zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist())]
+
+
+def rects(x_left, x_right, y0, y1):
+    """Return list of QRectF [x_left, x_right] x [y0, y1] for QPainter.drawRects"""
+    return [QtCore.QRectF(left, bottom, right - left, top - bottom)
+            for left, right, bottom, top in zip(x_left.tolist(), x_right.tolist(), y0.tolist(), y1.tolist())]
+
+
+def polyline(xs, ys):
+    """Return QPolygonF through all points for QPainter.drawPolyline"""
+    return QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class RangeIndex:
+    """
+    Segment tree over float values for range min or max query.
+
+    Leaves contain values, every node contain min or max of his 2 children, so
+    query for [start, stop) and update of one value are O(log n).
+    Tree builds by NumPy level by level, but stored in list, because scalar access to list is faster.
+    Tree grows (doubling count of leaves) when value index out of leaves.
+
+    """
+
+    MAX = 'max'
+    MIN = 'min'
+
+    def __init__(self, kind=MAX):
+        """
+        :param kind: MAX or MIN for get type of query
+        """
+        if kind == RangeIndex.MAX:
+            self._scalar, self._vector, self._identity = max, np.maximum, float('-inf')
+        else:
+            self._scalar, self._vector, self._identity = min, np.minimum, float('inf')
+        self._size = 1
+        self._tree = [self._identity] * 2
+
+    def build(self, values):
+        """Build tree for values in O(n)"""
+        size = 1
+        while size < len(values):
+            size *= 2
+        tree = np.full(2 * size, self._identity, dtype=np.float64)
+        tree[size:size + len(values)] = values
+        # every level of tree compute from level below by one vectorized call
+        level = size
+        while level > 1:
+            tree[level // 2:level] = self._vector(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+            level //= 2
+        self._size, self._tree = size, tree.tolist()
+
+    def set(self, index, value):
+        """Set value with this index and update all parents"""
+        if index >= self._size:
+            self.build(self._tree[self._size:] + [self._identity] * (index + 1 - self._size))
+        tree, function = self._tree, self._scalar
+        node = index + self._size
+        tree[node] = float(value)
+        node //= 2
+        while node:
+            tree[node] = function(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def query(self, start, stop):
+        """Return min or max of values [start, stop) or identity (+-inf) for empty range"""
+        tree, function = self._tree, self._scalar
+        result = self._identity
+        start, stop = max(start, 0) + self._size, min(stop, self._size) + self._size
+        while start < stop:
+            if start & 1:
+                result = function(result, tree[start])
+                start += 1
+            if stop & 1:
+                stop -= 1
+                result = function(result, tree[stop])
+            start //= 2
+            stop //= 2
+        return result
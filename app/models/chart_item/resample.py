@@ -0,0 +1,54 @@
+"""Resampling of candles from base time frame to higher time frame (5m, 15m, 1h, 4h, 1d, ... from 1m)"""
+import numpy as np
+
+
+# seconds in unit of time frame ('5m' - 5 minutes)
+TIME_FRAME_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+# unix-time 0 is Thursday, weeks begin on Monday
+WEEK_OFFSET = 4 * 86400
+
+
+def time_frame_seconds(time_frame):
+    """Return length of time frame in seconds ('1h' -> 3600) or None, if time frame have not fixed length"""
+    count, unit = time_frame[:-1], time_frame[-1:]
+    if not count.isdigit() or unit not in TIME_FRAME_UNITS:
+        return None
+    return int(count) * TIME_FRAME_UNITS[unit]
+
+
+def bucket_start(times, seconds):
+    """Return open time of higher time frame candle for every time (work with int and np.ndarray)"""
+    offset = WEEK_OFFSET if seconds % TIME_FRAME_UNITS['w'] == 0 else 0
+    return (times - offset) // seconds * seconds + offset
+
+
+def resample(candles, seconds):
+    """
+    Aggregate candles sorted by time in candles of time frame with length seconds.
+
+    :param candles: np.ndarray with rows [open, high, low, close, volume, time]
+    :return: np.ndarray with rows [open, high, low, close, volume, time], time - open time of bucket
+    """
+    candles = np.asarray(candles, dtype=np.float64).reshape(-1, 6)
+    if not len(candles):
+        return candles
+    buckets = bucket_start(candles[:, 5].astype(np.int64), seconds)
+    first = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    last = np.concatenate((first[1:], [len(candles)])) - 1
+    return np.column_stack((candles[first, 0], np.maximum.reduceat(candles[:, 1], first),
+                            np.minimum.reduceat(candles[:, 2], first), candles[last, 3],
+                            np.add.reduceat(candles[:, 4], first), buckets[first]))
+
+
+def resample_bucket(store, time, seconds):
+    """
+    Return higher time frame candle, that contain base candle with time.
+
+    Base candles of one bucket lie side by side in store (CandleStore sorted by time),
+    so update of live candle cost O(log n + candles in bucket), not full resample.
+    """
+    start = int(bucket_start(int(time), seconds))
+    times = store.time
+    first, last = np.searchsorted(times, [start, start + seconds])
+    return [float(store.open[first]), float(store.high[first:last].max()), float(store.low[first:last].min()),
+            float(store.close[last - 1]), float(store.volume[first:last].sum()), start]
@@ -0,0 +1,123 @@
+from pyqtgraph import QtCore, QtGui
+import bisect
+
+
+class SegmentedPicture:
+    """
+    Tiled QPicture cache for chart series.
+
+    Items of series split in 3 parts:
+        chunks - immutable pictures with completed items (CHUNK_SIZE items, chunks of prepended items can be less)
+        tail - picture with completed items, that not baked in chunk yet
+        live - picture with last item, redraw on every update
+    Paint callback must have signature draw_range(painter, start, stop) and paint items with index in [start, stop).
+    Chunks keep sequence numbers of items, so after prepend of items old chunks only painted with offset.
+
+    """
+
+    CHUNK_SIZE = 256
+
+    def __init__(self, draw_range, chunk_size=CHUNK_SIZE):
+        """
+        :param draw_range: callback for paint items [start, stop) on QPainter
+        :param chunk_size: count items in one baked chunk
+        """
+        self._draw_range = draw_range
+        self._chunk_size = chunk_size
+        self._count = 0
+        # sequence number of first item, decrease after prepend
+        self._first = 0
+        # [[start, stop, picture, first], ...] - start and stop are sequence numbers of items,
+        # picture painted when sequence number of first item was first
+        self._chunks = []
+        # sequence numbers of chunk starts for bisect
+        self._starts = []
+        self._tail = QtGui.QPicture()
+        self._live = QtGui.QPicture()
+
+    def _record(self, start, stop):
+        """Return QPicture() with items [start, stop)"""
+        picture = QtGui.QPicture()
+        painter = QtGui.QPainter(picture)
+        if start < stop:
+            self._draw_range(painter, start, stop)
+        painter.end()
+        return picture
+
+    def _record_chunk(self, start, stop):
+        return [start + self._first, stop + self._first, self._record(start, stop), self._first]
+
+    @property
+    def _baked(self):
+        """Count items in baked chunks"""
+        return self._chunks[-1][1] - self._first if self._chunks else 0
+
+    def _update_tail(self):
+        """Bake full chunks from completed items and redraw tail"""
+        completed = max(self._count - 1, 0)
+        while completed - self._baked >= self._chunk_size:
+            self._chunks.append(self._record_chunk(self._baked, self._baked + self._chunk_size))
+            self._starts.append(self._chunks[-1][0])
+        self._tail = self._record(self._baked, completed)
+
+    def _update_live(self):
+        self._live = self._record(max(self._count - 1, 0), self._count)
+
+    def rebuild(self, count):
+        """Drop all pictures and paint all items again"""
+        self._count = count
+        self._first = 0
+        self._chunks = []
+        self._starts = []
+        self._update_tail()
+        self._update_live()
+
+    def append(self):
+        """New item was appended to end of series"""
+        self._count += 1
+        self._update_tail()
+        self._update_live()
+
+    def prepend(self, count):
+        """count items were added before first item. Only new items painted, baked chunks not changed"""
+        if not self._count:
+            self.rebuild(count)
+            return
+        self._first -= count
+        self._count += count
+        head = [self._record_chunk(start, min(start + self._chunk_size, count))
+                for start in range(0, count, self._chunk_size)]
+        self._chunks = head + self._chunks
+        self._starts = [chunk[0] for chunk in head] + self._starts
+        # tail and live painted with old indexes
+        self._update_tail()
+        self._update_live()
+
+    def invalidate(self, index):
+        """Item with this index was replaced"""
+        if not 0 <= index < self._count:
+            return
+        if index == self._count - 1:
+            self._update_live()
+        elif index >= self._baked:
+            self._update_tail()
+        else:
+            position = bisect.bisect_right(self._starts, index + self._first) - 1
+            start, stop = self._chunks[position][:2]
+            self._chunks[position] = self._record_chunk(start - self._first, stop - self._first)
+
+    def paint(self, painter, start=0, stop=None):
+        """Paint pictures, that contain items from [start, stop). Chunks outside this range skipped"""
+        stop = self._count if stop is None else stop
+        first = max(bisect.bisect_right(self._starts, start + self._first) - 1, 0)
+        last = bisect.bisect_left(self._starts, stop + self._first)
+        for chunk in self._chunks[first:last]:
+            painter.drawPicture(QtCore.QPointF(chunk[3] - self._first, 0), chunk[2])
+        painter.drawPicture(0, 0, self._tail)
+        painter.drawPicture(0, 0, self._live)
+
+    def bounding_rect(self):
+        rect = QtCore.QRectF(self._tail.boundingRect()).united(QtCore.QRectF(self._live.boundingRect()))
+        for chunk in self._chunks:
+            rect = rect.united(QtCore.QRectF(chunk[2].boundingRect()).translated(chunk[3] - self._first, 0))
+        return rect
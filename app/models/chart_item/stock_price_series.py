@@ -1,5 +1,8 @@
 from pyqtgraph import QtCore, QtGui
 import pyqtgraph as pg
+from .segmented_picture import SegmentedPicture
+from .candle_store import CandleStore
+from . import lod, primitives
 import numpy as np
 
 
@@ -15,9 +18,8 @@ class StockPriceSeries(pg.GraphicsObject):
     """
     Price series for finance chart.
 
-    Storage data in format [[open, high, low, close, time], [...], ...].
-        open, high, low, close - must float type
-        time - can be str or unix-time
+    Show candles from CandleStore. Store can be shared with VolumeSeries and CustomAxisItem,
+    series repaint self after every change of store.
     Chart can by paint in 3 styles: candles (CANDLES_TYPE), bar (BAR_TYPE), line (LINE_TYPE)
     Auto-scaling will work by high and low if CANDLES_TYPE or BAR_TYPE used and by close if used LINE_TYPE.
 
@@ -27,71 +29,87 @@ class StockPriceSeries(pg.GraphicsObject):
     BAR_TYPE = 'bar'
     LINE_TYPE = 'line'
 
-    def __init__(self, data=None, chart_type=CANDLES_TYPE, border_color='b', positive_color='g', negative_color='r',
+    def __init__(self, store=None, chart_type=CANDLES_TYPE, border_color='b', positive_color='g', negative_color='r',
                  *args):
         """
-        :param data: starting data in format [[open, high, low, close, time], [...], ...]
+        :param store: CandleStore with data, if None, then will create empty store
         :param chart_type: value from (CANDLES_TYPE, BAR_TYPE, LINE_TYPE) for get paint style
         :param border_color: color of shadow and candle border
         :param positive_color: color of up candle or bar
         :param negative_color: color of down candle or bar
         """
         super(StockPriceSeries, self).__init__(*args)
-        self._data = data or []
+        self._store = None
         self._chart_type = chart_type
         self.border_color = border_color
         self.positive_color = positive_color
         self.negative_color = negative_color
 
-        self._chart_paint_method = {StockPriceSeries.CANDLES_TYPE: self._get_candles_chart,
-                                    StockPriceSeries.BAR_TYPE: self._get_bar_chart,
-                                    StockPriceSeries.LINE_TYPE: self._get_line_chart}
-
-        self._picture = None
+        self._chart_paint_method = {StockPriceSeries.CANDLES_TYPE: self._paint_candles_chart,
+                                    StockPriceSeries.BAR_TYPE: self._paint_bar_chart,
+                                    StockPriceSeries.LINE_TYPE: self._paint_line_chart}
+
+        self._picture = SegmentedPicture(self._paint_range)
+        # cache of aggregated picture for zoomed out chart
+        self._lod_picture = None
+        self._lod_key = None
+        self.set_store(store if store is not None else CandleStore())
+
+    def set_store(self, store):
+        """Show candles from other CandleStore"""
+        if self._store is not None:
+            self._store.reset_signal.disconnect(self._store_reset_slot)
+            self._store.candle_changed_signal.disconnect(self._candle_changed_slot)
+            self._store.trimmed_signal.disconnect(self._store_trimmed_slot)
+            self._store.prepended_signal.disconnect(self._store_prepended_slot)
+        self._store = store
+        self._store.reset_signal.connect(self._store_reset_slot)
+        self._store.candle_changed_signal.connect(self._candle_changed_slot)
+        self._store.trimmed_signal.connect(self._store_trimmed_slot)
+        self._store.prepended_signal.connect(self._store_prepended_slot)
         self.update_picture()
 
-    def set_data(self, data):
-        """Set new data set"""
-        self._data = data
+    @property
+    def store(self):
+        return self._store
 
+    def _store_reset_slot(self):
+        """New data set in store"""
         range_limit = dict()
-        max_high = max([item[1] for item in data]) if data else 1
-        min_low = min([item[2] for item in data]) if data else 0
-        range_limit['xRange'] = [0, len(data)]
-        range_limit['yRange'] = [min_low, max_high]
-        self.getViewBox().setRange(**range_limit, padding=0.01)
+        has_data = len(self._store) > 0
+        range_limit['xRange'] = [0, len(self._store)]
+        range_limit['yRange'] = [self._store.range_min(CandleStore.LOW) if has_data else 0,
+                                 self._store.range_max(CandleStore.HIGH) if has_data else 1]
+        if self.getViewBox() is not None:
+            self.getViewBox().setRange(**range_limit, padding=0.01)
 
         self.update_picture()
 
-    def append_or_replace(self, data_price):
-        """
-        Append new item or replace old price item by time.
-
-        Append new data_point to end or replace old point.
-        if 'time' already contain in data set, then replace.
-
-        """
-        index = -1
-        for ind, candle in enumerate(self._data):
-            if data_price[4] == candle[4]:
-                index = ind
-                break
-
-        if len(self._data) == 0 or index == -1:
-            self._data.append(data_price)
-        else:
-            self._data[index] = data_price
+    def _store_trimmed_slot(self, count):
+        """Oldest candles removed from store, x coord of all candles changed"""
         self.update_picture()
 
-    def append(self, data_price):
-        """
-        Append new item.
-
-        Append new data_point to end.
+    def _store_prepended_slot(self, count):
+        """Older candles added before first candle, only they painted"""
+        self.prepareGeometryChange()
+        self._picture.prepend(count)
+        # line segment to old first point start on last added point
+        if self._chart_type == StockPriceSeries.LINE_TYPE:
+            self._picture.invalidate(count)
+        self._lod_key = None
+        self.update()
 
-        """
-        self._data.append(data_price)
-        self.update_picture()
+    def _candle_changed_slot(self, index, is_new):
+        """Candle in store appended or replaced"""
+        if is_new:
+            self._picture.append()
+        else:
+            self._picture.invalidate(index)
+            # line segment to next point depend from this close
+            if self._chart_type == StockPriceSeries.LINE_TYPE:
+                self._picture.invalidate(index + 1)
+        self._lod_key = None
+        self.update()
 
     def set_chart_type(self, chart_type):
         """Set paint type for chart"""
@@ -101,102 +119,128 @@ class StockPriceSeries(pg.GraphicsObject):
         self._chart_type = chart_type
         self.update_picture()
 
-    def _get_candles_chart(self):
-        """Return QPicture() with candlestick chart by self._data"""
-        picture = QtGui.QPicture()
-        pen = QtGui.QPainter(picture)
-        pen.setPen(pg.mkPen(self.border_color, width=2))
-        width = 1 / 3.
-        for ind, candle in enumerate(self._data):
-            # Warning. if you paint line x -> y if x == y, then on pyqtgraph will paint white rectangle (bug?)
-            if candle[1] != candle[2]:
-                # paint shadow
-                pen.drawLine(QtCore.QPointF(ind, candle[2]), QtCore.QPointF(ind, candle[1]))
-
-            if candle[0] > candle[3]:
-                pen.setBrush(pg.mkBrush(self.negative_color))
-            else:
-                pen.setBrush(pg.mkBrush(self.positive_color))
-            # paint body
-            pen.drawRect(QtCore.QRectF(ind - width, candle[0], width * 2, candle[3] - candle[0]))
-        pen.end()
-        return picture
-
-    def _get_bar_chart(self):
-        """Return QPicture() with bar chart by self._data"""
-        picture = QtGui.QPicture()
-        pen = QtGui.QPainter(picture)
-        pen.setPen(pg.mkPen(self.border_color))
-        width = 1 / 3.
-        for ind, candle in enumerate(self._data):
-            if candle[0] > candle[3]:
-                pen.setPen(pg.mkPen(self.negative_color, width=5))
-            else:
-                pen.setPen(pg.mkPen(self.positive_color, width=5))
+    def _update_pens(self):
+        """Create pens and brushes once for all paints"""
+        self._border_pen = pg.mkPen(self.border_color, width=2)
+        self._line_pen = pg.mkPen(self.border_color)
+        self._positive_brush = pg.mkBrush(self.positive_color)
+        self._negative_brush = pg.mkBrush(self.negative_color)
+        self._positive_bar_pen = pg.mkPen(self.positive_color, width=5)
+        self._negative_bar_pen = pg.mkPen(self.negative_color, width=5)
+
+    def _paint_range(self, pen, start, stop):
+        """Paint items [start, stop) with current chart type"""
+        # every segment of line belongs to his right point, so need previous point
+        if self._chart_type == StockPriceSeries.LINE_TYPE:
+            start = max(start - 1, 0)
+        store = self._store
+        self._chart_paint_method[self._chart_type](pen, np.arange(start, stop, dtype=np.float64),
+                                                   store.open[start:stop], store.high[start:stop],
+                                                   store.low[start:stop], store.close[start:stop], 1 / 3.)
+
+    def _paint_candles_chart(self, pen, positions, opens, highs, lows, closes, width):
+        """Paint candlestick chart, x coord of every candle from positions. Shadows and bodies paint by batches"""
+        # Warning. if you paint line x -> y if x == y, then on pyqtgraph will paint white rectangle (bug?)
+        has_shadow = highs != lows
+        pen.setPen(self._border_pen)
+        pen.drawLines(primitives.segments(positions[has_shadow], lows[has_shadow],
+                                          positions[has_shadow], highs[has_shadow]))
+
+        is_negative = opens > closes
+        for brush, mask in ((self._negative_brush, is_negative), (self._positive_brush, ~is_negative)):
+            pen.setBrush(brush)
+            pen.drawRects(primitives.rects(positions[mask] - width, positions[mask] + width, opens[mask],
+                                           closes[mask]))
+
+    def _paint_bar_chart(self, pen, positions, opens, highs, lows, closes, width):
+        """Paint bar chart, x coord of every bar from positions. Bars of one color paint by one call"""
+        is_negative = opens > closes
+        for bar_pen, mask in ((self._negative_bar_pen, is_negative), (self._positive_bar_pen, ~is_negative)):
+            x, open_, high, low, close = positions[mask], opens[mask], highs[mask], lows[mask], closes[mask]
             # Warning. if paint line x->y | x==y, then pyqtgraph will paint white rectangle (bug?)
-            if candle[1] != candle[2]:
-                pen.drawLine(QtCore.QPointF(ind, candle[2]), QtCore.QPointF(ind, candle[1]))
-
-            pen.drawLine(QtCore.QPointF(ind - width, candle[0]), QtCore.QPointF(ind, candle[0]))
-            pen.drawLine(QtCore.QPointF(ind, candle[3]), QtCore.QPointF(ind + width, candle[3]))
-        pen.end()
-        return picture
-
-    def _get_line_chart(self):
-        """Return QPicture() with line chart by self._data"""
-        picture = QtGui.QPicture()
-        pen = QtGui.QPainter(picture)
-        pen.setPen(pg.mkPen(self.border_color))
-        for ind in range(0, len(self._data) - 1):
-            pen.drawLine(QtCore.QPointF(ind, self._data[ind][3]), QtCore.QPointF(ind + 1, self._data[ind + 1][3]))
-        pen.end()
-        return picture
+            has_shadow = high != low
+            pen.setPen(bar_pen)
+            pen.drawLines(primitives.segments(
+                np.concatenate((x[has_shadow], x - width, x)),
+                np.concatenate((low[has_shadow], open_, close)),
+                np.concatenate((x[has_shadow], x, x + width)),
+                np.concatenate((high[has_shadow], open_, close))))
+
+    def _paint_line_chart(self, pen, positions, opens, highs, lows, closes, width):
+        """Paint line chart by close price, x coord of every point from positions"""
+        pen.setPen(self._line_pen)
+        pen.drawPolyline(primitives.polyline(positions, closes))
+
+    def _get_decimated_picture(self, start, stop, factor):
+        """Return QPicture() with visible items aggregated by factor bars in one (cached until data change)"""
+        start = lod.align_start(start, factor)
+        key = (start, stop, factor, self._chart_type)
+        if self._lod_key != key:
+            store = self._store
+            decimated = lod.decimate_ohlc(store.open[start:stop], store.high[start:stop], store.low[start:stop],
+                                          store.close[start:stop], factor)
+            positions = lod.group_centers(start, stop - start, factor)
+
+            self._lod_picture = QtGui.QPicture()
+            pen = QtGui.QPainter(self._lod_picture)
+            self._chart_paint_method[self._chart_type](pen, positions, *decimated, factor / 3.)
+            pen.end()
+            self._lod_key = key
+        return self._lod_picture
 
     def update_picture(self):
-        """Update picture"""
-        self._picture = self._chart_paint_method[self._chart_type]()
+        """Repaint all picture"""
+        self._update_pens()
+        self._picture.rebuild(len(self._store))
+        self._lod_key = None
         self.update()
 
     def paint(self, p, *args):
-        """overwrite for paint"""
-        p.drawPicture(0, 0, self._picture)
+        """overwrite for paint. Paint only visible items, aggregated if some bars in one pixel"""
+        start, stop = lod.visible_range(self.getViewBox(), len(self._store))
+        factor = lod.decimation_factor(self)
+        if factor > 1 and start < stop:
+            p.drawPicture(0, 0, self._get_decimated_picture(start, stop, factor))
+        else:
+            self._picture.paint(p, start, stop)
 
     def boundingRect(self):
-        # If not use numpy, then very small value will not paint
-        if self._data:
-            x_min = np.float(-1)
-            x_max = np.float(len(self._data) + 1)
-            y_min = np.float(-1)
-            y_max = np.float(max([item[1] for item in self._data]))
+        if len(self._store):
+            x_min = float(-1)
+            x_max = float(len(self._store) + 1)
+            y_min = float(-1)
+            y_max = float(self._store.range_max(CandleStore.HIGH))
             return QtCore.QRectF(x_min, y_min, x_max - x_min, y_max - y_min)
-        return QtCore.QRectF(self._picture.boundingRect())
+        return self._picture.bounding_rect()
 
     def dataBounds(self, ax=None, frac=1.0, orthoRange=None):
         """For auto-scaling"""
-        if not self._data:
+        if not len(self._store):
             return None, None
 
         view_range = self.getViewBox().viewRange()
-        count = len(self._data)
+        count = len(self._store)
         # +-1 for extra indent
         left, right = int(view_range[0][0]) - 1, int(view_range[0][1]) + 1
         if (left < 0 and right < 0) or (left > count and right > count):
             return None, None
         if left < 0:
             left = 0
+        if left >= min(right, count):
+            return None, None
 
         if self._chart_type == StockPriceSeries.LINE_TYPE:
-            seq_close = [item[3] for item in self._data[left:right]]
-            minimum, maximum = min(seq_close), max(seq_close) if seq_close else (None, None)
+            minimum = self._store.range_min(CandleStore.CLOSE, left, right)
+            maximum = self._store.range_max(CandleStore.CLOSE, left, right)
         else:
-            seq_high = [item[1] for item in self._data[left:right]]
-            seq_low = [item[2] for item in self._data[left:right]]
-            minimum, maximum = (min(seq_low), max(seq_high)) if seq_high and seq_low else (None, None)
+            minimum = self._store.range_min(CandleStore.LOW, left, right)
+            maximum = self._store.range_max(CandleStore.HIGH, left, right)
 
         return minimum, maximum
 
     def __getitem__(self, item):
-        return self._data[item]
+        """Return candle in format (open, high, low, close, volume, time)"""
+        return self._store[item]
 
     def __len__(self):
-        return len(self._data)
+        return len(self._store)
@@ -1,36 +1,136 @@
+from .candle_store import CandleStore
 import pyqtgraph as pg
+import numpy as np
+import functools
 import datetime
+import time
+
+
+@functools.lru_cache(maxsize=4096)
+def format_time(timestamp, mask):
+    """Return local time of timestamp by mask. Memoized, same labels repeat on every frame of pan"""
+    return datetime.datetime.fromtimestamp(timestamp).strftime(mask)
 
 
 class CustomAxisItem(pg.AxisItem):
-    """Custom axis for plot"""
+    """
+    Custom axis for plot. Show time of candles from CandleStore.
+
+    Ticks placed on first candle of round calendar interval (hour, day, month, ...), interval selected by zoom.
+    Indexes of first candles of interval computed once for all candles of store (updated on append),
+    so ticks for frame get by binary search and labels get from cache.
+    """
+
+    # (unit, count, label mask). None mask - time_mask of axis
+    TICK_STEPS = (('s', 60, None), ('s', 300, None), ('s', 900, None), ('s', 1800, None),
+                  ('s', 3600, None), ('s', 7200, None), ('s', 14400, None), ('s', 21600, None), ('s', 43200, None),
+                  ('s', 86400, '%Y-%m-%d'), ('s', 172800, '%Y-%m-%d'), ('s', 604800, '%Y-%m-%d'),
+                  ('M', 1, '%Y-%m'), ('M', 3, '%Y-%m'), ('M', 6, '%Y-%m'), ('Y', 1, '%Y'), ('Y', 5, '%Y'))
+    # approximate length of unit in seconds for select step
+    UNIT_SECONDS = {'s': 1, 'M': 2629746, 'Y': 31556952}
+    # min distance between labels in pixels
+    MIN_TICK_SPACING = 130
 
-    def __init__(self, data_axis=None, time_mask='%Y-%m-%d %H:%M', *args, **kwargs):
+    def __init__(self, store=None, time_mask='%Y-%m-%d %H:%M', *args, **kwargs):
         pg.AxisItem.__init__(self, *args, **kwargs)
-        self._seq_data = data_axis if data_axis else []
+        self._store = None
         self._mask = time_mask
+        # {step: np.ndarray of indexes of first candles in intervals, ...}
+        self._boundaries = dict()
+        # intervals begin at local midnight, not at UTC midnight
+        self._utc_offset = time.localtime().tm_gmtoff
+        self.set_store(store if store is not None else CandleStore())
+
+    def set_store(self, store):
+        if self._store is not None:
+            self._store.reset_signal.disconnect(self._store_reset_slot)
+            self._store.candle_changed_signal.disconnect(self._candle_changed_slot)
+            self._store.trimmed_signal.disconnect(self._store_trimmed_slot)
+            self._store.prepended_signal.disconnect(self._store_prepended_slot)
+        self._store = store
+        self._store.reset_signal.connect(self._store_reset_slot)
+        self._store.candle_changed_signal.connect(self._candle_changed_slot)
+        self._store.trimmed_signal.connect(self._store_trimmed_slot)
+        self._store.prepended_signal.connect(self._store_prepended_slot)
+        self._boundaries = dict()
+
+    @property
+    def store(self):
+        return self._store
+
+    def _store_reset_slot(self):
+        self._boundaries = dict()
+
+    def _store_trimmed_slot(self, count):
+        """Oldest candles removed, boundaries of intervals shifted to new indexes"""
+        self._boundaries = {step: boundaries[boundaries > count] - count
+                            for step, boundaries in self._boundaries.items()}
+
+    def _store_prepended_slot(self, count):
+        """Older candles added, boundaries of intervals found again on next paint"""
+        self._boundaries = dict()
+
+    def _candle_changed_slot(self, index, is_new):
+        if not is_new or index == 0:
+            return
+        # new candle can begin new interval, check only it and previous candle
+        for step, boundaries in self._boundaries.items():
+            previous, current = self._interval_ids(self._store.time[index - 1:index + 1], step)
+            if previous != current:
+                self._boundaries[step] = np.append(boundaries, index)
+
+    def _interval_ids(self, times, step):
+        """Return number of calendar interval (in local time) for every time"""
+        unit, count, _ = step
+        local = times + self._utc_offset
+        if unit == 's':
+            return local // count
+        return local.astype('datetime64[s]').astype(f'datetime64[{unit}]').astype(np.int64) // count
+
+    def _get_boundaries(self, step):
+        if step not in self._boundaries:
+            times = self._store.time
+            ids = self._interval_ids(times, step) if len(times) else times
+            self._boundaries[step] = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        return self._boundaries[step]
+
+    def tickValues(self, minVal, maxVal, size):
+        """Return ticks on first candles of calendar intervals, step of intervals depend on zoom"""
+        times = self._store.time
+        first, last = max(int(np.ceil(minVal)), 0), min(int(maxVal), len(times) - 1)
+        if first >= last:
+            return pg.AxisItem.tickValues(self, minVal, maxVal, size)
 
-    def append(self, data_axis_list):
-        if data_axis_list not in self._seq_data:
-            self._seq_data.append(data_axis_list)
+        max_ticks = max(size / self.MIN_TICK_SPACING, 1)
+        span = times[last] - times[first]
+        step = self.TICK_STEPS[-1]
+        for item in self.TICK_STEPS:
+            if span / (item[1] * self.UNIT_SECONDS[item[0]]) <= max_ticks:
+                step = item
+                break
 
-    def set_data(self, data_axis):
-        self._seq_data = data_axis
+        boundaries = self._get_boundaries(step)
+        start, stop = np.searchsorted(boundaries, first), np.searchsorted(boundaries, last, side='right')
+        if start == stop:
+            return pg.AxisItem.tickValues(self, minVal, maxVal, size)
+        # spacing of level is step, tickStrings select label mask by it
+        return [(step, boundaries[start:stop].tolist())]
 
     def tickStrings(self, values, scale, spacing):
         """Show axis item subject to scaling"""
+        mask = spacing[2] if isinstance(spacing, tuple) and spacing[2] else self._mask
         set_for_show = []
+        times = self._store.time
         for value in values:
             ind = int(value * scale)
             item = ''
-            if 0 <= ind < len(self._seq_data):
-                item = self._seq_data[ind]
-                item = str(datetime.datetime.fromtimestamp(item).strftime(self._mask))
+            if 0 <= ind < len(times):
+                item = format_time(int(times[ind]), mask)
             set_for_show.append(item)
         return set_for_show
 
     def __getitem__(self, item):
-        return self._seq_data[item]
+        return int(self._store.time[item])
 
     def __len__(self):
-        return len(self._seq_data)
+        return len(self._store)
@@ -1,86 +1,157 @@
 from pyqtgraph import QtCore, QtGui
 import pyqtgraph as pg
+from .segmented_picture import SegmentedPicture
+from .candle_store import CandleStore
+from . import lod, primitives
 import numpy as np
 
 
 class VolumeSeries(pg.GraphicsObject):
+    """Volume bars of candles from CandleStore. Store can be shared with StockPriceSeries and CustomAxisItem"""
 
-    def __init__(self, data=None, color_bar="g", pen_color="b"):
+    def __init__(self, store=None, color_bar="g", pen_color="b"):
         super(VolumeSeries, self).__init__()
         self._border_color = pen_color
         self._color_bar = color_bar
-        self._data = data or []
-        self._picture = None
+        self._store = None
+        self._picture = SegmentedPicture(self._paint_range)
+        # cache of aggregated volumes and picture for zoomed out chart
+        self._lod_volumes = None
+        self._lod_picture = None
+        self._lod_key = None
+        self.set_store(store if store is not None else CandleStore())
+
+    def set_store(self, store):
+        """Show volumes from other CandleStore"""
+        if self._store is not None:
+            self._store.reset_signal.disconnect(self._store_reset_slot)
+            self._store.candle_changed_signal.disconnect(self._candle_changed_slot)
+            self._store.trimmed_signal.disconnect(self._store_trimmed_slot)
+            self._store.prepended_signal.disconnect(self._store_prepended_slot)
+        self._store = store
+        self._store.reset_signal.connect(self._store_reset_slot)
+        self._store.candle_changed_signal.connect(self._candle_changed_slot)
+        self._store.trimmed_signal.connect(self._store_trimmed_slot)
+        self._store.prepended_signal.connect(self._store_prepended_slot)
         self.update_picture()
 
-    def set_data(self, data):
-        self._data = data
+    @property
+    def store(self):
+        return self._store
 
+    def _store_reset_slot(self):
         range_limit = dict()
-        max_high = max([item[0] for item in data]) if data else 1
-        range_limit['xRange'] = [0, len(data)]
+        max_high = self._store.range_max(CandleStore.VOLUME) if len(self._store) else 1
+        range_limit['xRange'] = [0, len(self._store)]
         range_limit['yRange'] = [0, max_high]
-        self.getViewBox().setRange(**range_limit, padding=0.01)
+        if self.getViewBox() is not None:
+            self.getViewBox().setRange(**range_limit, padding=0.01)
 
         self.update_picture()
 
-    def append(self, bar):
-        self._data.append(bar)
+    def _store_trimmed_slot(self, count):
+        """Oldest candles removed from store, x coord of all bars changed"""
         self.update_picture()
 
-    def append_or_replace(self, bar):
-        if len(self._data) == 0 or bar[1] not in [item[1] for item in self._data]:
-            self._data.append(bar)
+    def _store_prepended_slot(self, count):
+        """Older candles added before first candle, only their bars painted"""
+        self.prepareGeometryChange()
+        self._picture.prepend(count)
+        self._lod_key = None
+        self.update()
+
+    def _candle_changed_slot(self, index, is_new):
+        if is_new:
+            self._picture.append()
         else:
-            index = next((index for (index, d) in enumerate(self._data) if d[1] == bar[1]), None)
-            self._data[index] = bar
-        self.update_picture()
+            self._picture.invalidate(index)
+        self._lod_key = None
+        self.update()
+
+    def _paint_range(self, pen, start, stop):
+        """Paint bars [start, stop)"""
+        self._paint_bars(pen, np.arange(start, stop, dtype=np.float64), self._store.volume[start:stop], 1 / 3.)
+
+    def _paint_bars(self, pen, positions, volumes, width):
+        """Paint all bars by one call"""
+        pen.setPen(self._border_pen)
+        pen.setBrush(self._bar_brush)
+        pen.drawRects(primitives.rects(positions - width, positions + width, np.zeros(len(volumes)), volumes))
+
+    def _update_decimated(self, start, stop, factor):
+        """Aggregate visible volumes by factor bars in one (cached until data change)"""
+        start = lod.align_start(start, factor)
+        key = (start, stop, factor)
+        if self._lod_key != key:
+            self._lod_volumes = lod.decimate_sum(self._store.volume[start:stop], factor)
+
+            self._lod_picture = QtGui.QPicture()
+            pen = QtGui.QPainter(self._lod_picture)
+            self._paint_bars(pen, lod.group_centers(start, stop - start, factor), self._lod_volumes, factor / 3.)
+            pen.end()
+            self._lod_key = key
 
     def update_picture(self):
-        self._picture = QtGui.QPicture()
-        pen = QtGui.QPainter(self._picture)
-        pen.setPen(pg.mkPen(self._border_color))
-        pen.setBrush(pg.mkBrush(self._color_bar))
-        width = 1 / 3.
-        for ind, bar in enumerate(self._data):
-            pen.drawRect(QtCore.QRectF(ind - width, 0, width * 2, bar[0]))
-        pen.end()
+        # create pen and brush once for all paints
+        self._border_pen = pg.mkPen(self._border_color)
+        self._bar_brush = pg.mkBrush(self._color_bar)
+        self._picture.rebuild(len(self._store))
+        self._lod_key = None
         self.update()
 
     def paint(self, p, *args):
-        p.drawPicture(0, 0, self._picture)
+        """Paint only visible bars, aggregated if some bars in one pixel"""
+        start, stop = lod.visible_range(self.getViewBox(), len(self._store))
+        factor = lod.decimation_factor(self)
+        if factor > 1 and start < stop:
+            self._update_decimated(start, stop, factor)
+            p.drawPicture(0, 0, self._lod_picture)
+        else:
+            self._picture.paint(p, start, stop)
 
     def boundingRect(self):
-        if self._data:
-            x_min = np.float(-1)
-            x_max = np.float(len(self._data) + 1)
-            y_min = np.float(-1)
-            y_max = np.float(max([v[0] for v in self._data]))
+        if len(self._store):
+            x_min = float(-1)
+            x_max = float(len(self._store) + 1)
+            y_min = float(-1)
+            y_max = float(self._store.range_max(CandleStore.VOLUME))
+            # aggregated bars are higher than single bar
+            if self._lod_key is not None:
+                y_max = max(y_max, float(self._lod_volumes.max()))
             return QtCore.QRectF(x_min, y_min, x_max-x_min, y_max-y_min)
-        return QtCore.QRectF(self._picture.boundingRect())
+        return self._picture.bounding_rect()
 
     def dataBounds(self, ax=None, frac=1.0, orthoRange=None):
         """For auto-scaling"""
-        if not self._data:
+        if not len(self._store):
             return None, None
 
         view_range = self.getViewBox().viewRange()
-        count = len(self._data)
+        count = len(self._store)
         # +-1 for extra indent
         left, right = int(view_range[0][0]) - 1, int(view_range[0][1]) + 1
         if (left < 0 and right < 0) or (left > count and right > count):
             return None, None
         if left < 0:
             left = 0
+        if left >= min(right, count):
+            return None, None
+
+        # if bars aggregated, then scale by summed volumes
+        factor = lod.decimation_factor(self)
+        start, stop = lod.visible_range(self.getViewBox(), count)
+        if factor > 1 and start < stop:
+            self._update_decimated(start, stop, factor)
+            return 0, float(self._lod_volumes.max())
 
-        volumes = [item[0] for item in self._data[left:right]]
         minimum = 0
-        maximum = max(volumes)
+        maximum = self._store.range_max(CandleStore.VOLUME, left, right)
 
         return minimum, maximum
 
     def __getitem__(self, item):
-        return self._data[item]
+        """Return candle in format (open, high, low, close, volume, time)"""
+        return self._store[item]
 
     def __len__(self):
-        return len(self._data)
+        return len(self._store)
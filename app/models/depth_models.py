@@ -1,5 +1,7 @@
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtCore import Qt
+from .number_format import format_number
+import numpy as np
 
 
 class DepthTableModel(QtCore.QAbstractTableModel):
@@ -10,33 +12,65 @@ class DepthTableModel(QtCore.QAbstractTableModel):
     rowCount - count rows
     columnCount - count columns
     data - table for display.
-        Format: [[buyers], [sellers]]. buyers | sellers : [[price, quantity], [price, quantity], ...]
+        Format: [[buyers], [sellers]]. buyers | sellers : np.ndarray with rows [price, quantity, total],
+        total - cumulative quantity from best price
     headerData - display settings
-    set_data - set new data
+    set_data - set new data. New depth compared with previous, dataChanged emit only for changed rows,
+        rows inserted or removed only if count of levels changed
     clear - clear all table
     """
 
     def __init__(self, parent=None):
         super(DepthTableModel, self).__init__(parent)
-        self._headers = ['Price', 'Volume']
-        self._source = dict(buy=[], sell=[])
+        self._headers = ['Price', 'Volume', 'Total']
+        self._source = dict(buy=np.empty((0, 3)), sell=np.empty((0, 3)))
+        # brushes created once, data() called for every cell on every repaint
+        self._sell_brush = QtGui.QBrush(QtGui.QColor.fromRgb(QtGui.qRgb(255, 153, 153)))
+        self._buy_brush = QtGui.QBrush(QtGui.QColor.fromRgb(QtGui.qRgb(153, 255, 153)))
 
     def set_data(self, buy, sell):
-        self._source['buy'] = buy
-        self._source['sell'] = sell
-        self.layoutChanged.emit()
+        # sell rows above buy rows, so sell side first (insert or remove sell rows shift buy rows)
+        columns = len(self._headers)
+        self._update_side('sell', np.asarray(sell, dtype=np.float64).reshape(-1, columns), 0)
+        self._update_side('buy', np.asarray(buy, dtype=np.float64).reshape(-1, columns), len(self._source['sell']))
+
+    def _update_side(self, side, new, offset):
+        """Replace levels of one side, that begin from row offset, with minimal model signals"""
+        old = self._source[side]
+        if len(new) < len(old):
+            self.beginRemoveRows(QtCore.QModelIndex(), offset + len(new), offset + len(old) - 1)
+            self._source[side] = old = old[:len(new)]
+            self.endRemoveRows()
+        elif len(new) > len(old):
+            self.beginInsertRows(QtCore.QModelIndex(), offset + len(old), offset + len(new) - 1)
+            self._source[side] = np.concatenate((old, new[len(old):]))
+            self.endInsertRows()
+
+        count = min(len(old), len(new))
+        changed = old[:count] != new[:count]
+        self._source[side] = new
+        rows = np.flatnonzero(changed.any(axis=1))
+        if not len(rows):
+            return
+        # one dataChanged for every block of neighboring changed rows
+        breaks = np.flatnonzero(np.diff(rows) > 1) + 1
+        for first, last in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(rows)])) - 1):
+            columns = np.flatnonzero(changed[rows[first]:rows[last] + 1].any(axis=0))
+            self.dataChanged.emit(self.index(offset + int(rows[first]), int(columns[0])),
+                                  self.index(offset + int(rows[last]), int(columns[-1])), [Qt.DisplayRole])
 
     def clear(self):
-        self._source['buy'].clear()
-        self._source['sell'].clear()
-        self.layoutChanged.emit()
+        self.beginResetModel()
+        self._source['buy'] = np.empty((0, 3))
+        self._source['sell'] = np.empty((0, 3))
+        self.endResetModel()
 
-    def rowCount(self, n):
-        if not self._source:
+    def rowCount(self, n=QtCore.QModelIndex()):
+        if n is not None and n.isValid():
             return 0
         return len(self._source['sell']) + len(self._source['buy'])
 
-    def columnCount(self, n):
+    def columnCount(self, n=QtCore.QModelIndex()):
         return len(self._headers)
 
     def data(self, index, role):
@@ -45,16 +79,16 @@ class DepthTableModel(QtCore.QAbstractTableModel):
         if role == Qt.DisplayRole:
             # sell
             if index.row() < len(self._source['sell']):
-                return self._source['sell'][index.row()][index.column()]
+                return format_number(float(self._source['sell'][index.row(), index.column()]))
             else:
                 # buy
                 ind = index.row() - len(self._source['sell'])
-                return self._source['buy'][ind][index.column()]
+                return format_number(float(self._source['buy'][ind, index.column()]))
         elif role == Qt.BackgroundRole:
             if index.row() < len(self._source['sell']):
-                return QtGui.QBrush(QtGui.QColor.fromRgb(QtGui.qRgb(255, 153, 153)))
+                return self._sell_brush
             else:
-                return QtGui.QBrush(QtGui.QColor.fromRgb(QtGui.qRgb(153, 255, 153)))
+                return self._buy_brush
 
     def headerData(self, section, orientation, role):
         if role == Qt.DisplayRole:
@@ -71,8 +105,8 @@ if __name__ == '__main__':
 
     tableView.verticalHeader().hide()
     m = DepthTableModel()
-    source = ([['buy_price1', 'buy_volume1'], ['buy_price2', 'buy_volume2']],
-              [['sell_price1', 'sell_volume1'], ['sell_price2', 'sell_volume2'], ['sell_price2', 'sell_volume2']])
+    source = (np.array([[0.00001234, 10., 10.], [0.00001233, 5.5, 15.5]]),
+              np.array([[0.00001237, 1., 6.], [0.00001236, 2., 5.], [0.00001235, 3., 3.]]))
     m.set_data(source[0], source[1])
     tableView.setModel(m)
     tableView.show()
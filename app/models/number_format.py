@@ -0,0 +1,8 @@
+import numpy as np
+
+
+def format_number(value):
+    """Return float as str without exponent and trailing zeros (very small prices must be readable). Other as is"""
+    if isinstance(value, float):
+        return np.format_float_positional(value, trim='-')
+    return value
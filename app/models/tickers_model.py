@@ -1,59 +1,109 @@
 from PyQt5.QtCore import Qt
 from PyQt5 import QtCore
+from .number_format import format_number
 
 
 class TickerTableModel(QtCore.QAbstractTableModel):
-    """Model for ticker table"""
+    """
+    Model for ticker table.
+
+    Row in format [symbol, bid, ask]. Symbol -> row index kept in dict, so update and contain are O(1).
+    update - update one row (or add, if symbol is new), dataChanged emit only for changed cells.
+    update_many - apply many rows in one transaction (one insert and one dataChanged for every block
+        of neighboring changed rows, like DepthTableModel).
+    """
 
     def __init__(self, header, parent=None):
         super(TickerTableModel, self).__init__(parent)
         self._headers = header
         self._data = []
+        # {symbol: row, ...}
+        self._rows = dict()
+
+    def removeRow(self, row, parent=QtCore.QModelIndex()):
+        if not 0 <= row < len(self._data):
+            return False
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._rows[self._data[row][0]]
+        del self._data[row]
+        for ind in range(row, len(self._data)):
+            self._rows[self._data[ind][0]] = ind
+        self.endRemoveRows()
+        return True
 
-    def removeRow(self, row, parent=None):
-        try:
-            del self._data[row]
-            self.layoutChanged.emit()
-            return True
-        except ValueError:
+    def remove(self, symbol):
+        """Remove row of symbol. Return False, if symbol not in table"""
+        if symbol not in self._rows:
             return False
+        return self.removeRow(self._rows[symbol])
 
     def update(self, data):
-        symbols = [item[0] for item in self._data]
-        if data[0] in symbols:
-            index = symbols.index(data[0])
-            self._data[index] = data
-        else:
-            self._data.append(data)
+        self.update_many([data])
+
+    def update_many(self, rows):
+        """Update rows by symbol (first item of row), new symbols add to end of table"""
+        new_rows = []
+        # {row: (first changed column, last changed column), ...}
+        changed_rows = dict()
+        for data in rows:
+            data = list(data)
+            row = self._rows.get(data[0])
+            if row is None:
+                new_rows.append(data)
+                continue
+            changed = [column for column, value in enumerate(data) if self._data[row][column] != value]
+            if changed:
+                self._data[row] = data
+                columns = changed_rows.get(row, (changed[0], changed[-1]))
+                changed_rows[row] = (min(columns[0], changed[0]), max(columns[1], changed[-1]))
+
+        # one dataChanged for every block of neighboring changed rows
+        block = []
+        for row in sorted(changed_rows):
+            if block and row != block[-1] + 1:
+                self._emit_changed(block, changed_rows)
+                block = []
+            block.append(row)
+        if block:
+            self._emit_changed(block, changed_rows)
+
+        # symbol can repeat in one batch, then only last data added
+        new_rows = list({data[0]: data for data in new_rows}.values())
+        if new_rows:
+            first = len(self._data)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(new_rows) - 1)
+            for ind, data in enumerate(new_rows):
+                self._rows[data[0]] = first + ind
+            self._data.extend(new_rows)
+            self.endInsertRows()
 
-        self.layoutChanged.emit()
+    def _emit_changed(self, block, changed_rows):
+        first_column = min(changed_rows[row][0] for row in block)
+        last_column = max(changed_rows[row][1] for row in block)
+        self.dataChanged.emit(self.index(block[0], first_column), self.index(block[-1], last_column),
+                              [Qt.DisplayRole])
 
     def contain(self, data):
-        symbols = [item[0] for item in self._data]
-        if data in symbols:
-            return True
-        return False
+        return data in self._rows
 
     def clear(self):
+        self.beginResetModel()
         self._data = []
-        self.layoutChanged.emit()
+        self._rows = dict()
+        self.endResetModel()
 
-    def rowCount(self, n):
-        if not self._data:
+    def rowCount(self, n=QtCore.QModelIndex()):
+        if n is not None and n.isValid():
             return 0
         return len(self._data)
 
-    def columnCount(self, n):
+    def columnCount(self, n=QtCore.QModelIndex()):
         return len(self._headers)
 
     def data(self, index, role):
         if role == Qt.DisplayRole:
-            # почему то isdigit, isdecimal и т. д. не работают на очень малых числах, так что try except
-            try:
-                result = self._data[index.row()][index.column()]
-            except ValueError:
-                result = self._data[index.row()][index.column()]
-            return result
+            # bid and ask are floats, very small numbers must show without exponent
+            return format_number(self._data[index.row()][index.column()])
 
     def headerData(self, section, orientation, role):
         if role == Qt.DisplayRole:
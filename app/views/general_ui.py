@@ -6,7 +6,7 @@ class GeneralUI(object):
 
     def __init__(self, main_window):
         name_window = "Crypto currency"
-        name_tab_1 = "Chart"
+        self._name_tab = "Chart"
 
         # Generate UI
         main_window.resize(1280, 720)
@@ -15,18 +15,36 @@ class GeneralUI(object):
         # main layout
         main_layout = QtWidgets.QVBoxLayout(central_widget)
 
-        # base tab
+        # base tab. Every chart tab is TabChartView, all tabs use one WS connection
         self.tab_widget = QtWidgets.QTabWidget()
+        self.tab_widget.setTabsClosable(True)
+        self.tab_widget.tabCloseRequested.connect(self._close_tab)
+        self.new_tab_button = QtWidgets.QPushButton('+')
+        self.new_tab_button.clicked.connect(self._add_chart_tab)
+        self.tab_widget.setCornerWidget(self.new_tab_button)
         # chart tab
-        self.tab_chart_view = TabChartView()
-        self.tab_widget.addTab(self.tab_chart_view, '')
+        self.tab_chart_view = self._add_chart_tab()
 
         main_layout.addWidget(self.tab_widget)
         main_window.setCentralWidget(central_widget)
 
         main_window.setWindowTitle(QtWidgets.QApplication.translate("MainWindow", name_window, None, -1))
-        self.tab_widget.setTabText(self.tab_widget.indexOf(
-            self.tab_chart_view), QtWidgets.QApplication.translate("MainWindow", name_tab_1, None, -1))
 
         self.tab_widget.setCurrentIndex(0)
         QtCore.QMetaObject.connectSlotsByName(main_window)
+
+    def _add_chart_tab(self):
+        tab_chart_view = TabChartView()
+        name = self._name_tab if not self.tab_widget.count() else f'{self._name_tab} {self.tab_widget.count() + 1}'
+        index = self.tab_widget.addTab(tab_chart_view, QtWidgets.QApplication.translate("MainWindow", name, None, -1))
+        self.tab_widget.setCurrentIndex(index)
+        return tab_chart_view
+
+    def _close_tab(self, index):
+        """Close chart tab, last tab can't be closed"""
+        if self.tab_widget.count() == 1:
+            return
+        tab_chart_view = self.tab_widget.widget(index)
+        tab_chart_view.close_tab()
+        self.tab_widget.removeTab(index)
+        tab_chart_view.deleteLater()
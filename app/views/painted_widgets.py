@@ -0,0 +1,23 @@
+from pyqtgraph import PlotWidget
+from PyQt5 import QtCore, QtWidgets
+
+
+class PaintedPlotWidget(PlotWidget):
+    """PlotWidget, that emit painted_signal after every repaint (end of paint for latency measure)"""
+
+    painted_signal = QtCore.pyqtSignal()
+
+    def paintEvent(self, event):
+        result = super(PaintedPlotWidget, self).paintEvent(event)
+        self.painted_signal.emit()
+        return result
+
+
+class PaintedTableView(QtWidgets.QTableView):
+    """QTableView, that emit painted_signal after every repaint (end of paint for latency measure)"""
+
+    painted_signal = QtCore.pyqtSignal()
+
+    def paintEvent(self, event):
+        super(PaintedTableView, self).paintEvent(event)
+        self.painted_signal.emit()
@@ -1,7 +1,8 @@
 from app.controllers.tab_chart_controller import TabChartController
+from app.views.painted_widgets import PaintedPlotWidget, PaintedTableView
 from app.models import CustomAxisItem
 from pyqtgraph import PlotWidget
-from PyQt5 import QtWidgets, Qt
+from PyQt5 import QtWidgets, QtGui, Qt
 
 
 class TabChartView(QtWidgets.QWidget):
@@ -14,22 +15,28 @@ class TabChartView(QtWidgets.QWidget):
         self._setup_ui()
         self._controller = TabChartController(self)
 
+    def close_tab(self):
+        """Unsubscribe data of tab before delete tab"""
+        self._controller.close()
+
     def _setup_ui(self):
         horizontal_layout = QtWidgets.QHBoxLayout(self)
 
         # list symbols area
+        self.connection_label = QtWidgets.QLabel('Server: connecting')
         label_exchange = QtWidgets.QLabel('Exchanges')
         self.exchanges_combobox = QtWidgets.QComboBox()
         self.exchanges_combobox.setCurrentIndex(0)
         label_symbols = QtWidgets.QLabel('Pairs')
         self.pairs_combobox = QtWidgets.QComboBox()
-        self.tickers_table = QtWidgets.QTableView()
+        self.tickers_table = PaintedTableView()
         self.tickers_table.setSelectionBehavior(Qt.QAbstractItemView.SelectRows)
         self.tickers_table.verticalHeader().close()
         self.tickers_table.setSelectionMode(Qt.QAbstractItemView.SingleSelection)
         self.delete_ticker_button = QtWidgets.QPushButton('Delete from list')
 
         vertical_layout_1 = QtWidgets.QVBoxLayout()
+        vertical_layout_1.addWidget(self.connection_label)
         vertical_layout_1.addWidget(label_exchange)
         vertical_layout_1.addWidget(self.exchanges_combobox)
         vertical_layout_1.addWidget(label_symbols)
@@ -39,11 +46,22 @@ class TabChartView(QtWidgets.QWidget):
         horizontal_layout.addLayout(vertical_layout_1, 2)
 
         # table cup area
-        self.depth_table = QtWidgets.QTableView()
+        self.depth_grouping_combobox = QtWidgets.QComboBox()
+        self.depth_levels_spinbox = QtWidgets.QSpinBox()
+        self.depth_levels_spinbox.setRange(1, 1000)
+        self.depth_levels_spinbox.setPrefix('Levels: ')
+        depth_panel_layout = QtWidgets.QHBoxLayout()
+        depth_panel_layout.addWidget(QtWidgets.QLabel('Group'))
+        depth_panel_layout.addWidget(self.depth_grouping_combobox)
+        depth_panel_layout.addWidget(self.depth_levels_spinbox)
+        self.depth_table = PaintedTableView()
         self.depth_table.setSelectionMode(Qt.QAbstractItemView.SelectionMode.NoSelection)
         self.depth_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
         self.depth_table.verticalHeader().close()
-        horizontal_layout.addWidget(self.depth_table, 2)
+        vertical_layout_depth = QtWidgets.QVBoxLayout()
+        vertical_layout_depth.addLayout(depth_panel_layout)
+        vertical_layout_depth.addWidget(self.depth_table)
+        horizontal_layout.addLayout(vertical_layout_depth, 2)
 
         # tools for chart area
         vertical_layout_2 = QtWidgets.QVBoxLayout()
@@ -64,9 +82,23 @@ class TabChartView(QtWidgets.QWidget):
         self.panel_layout.addWidget(self.timeframe_combobox)
         self.chart_type_combobox = QtWidgets.QComboBox()
         self.panel_layout.addWidget(self.chart_type_combobox)
+        self.indicators_button = QtWidgets.QToolButton()
+        self.indicators_button.setText('Indicators')
+        self.indicators_button.setPopupMode(QtWidgets.QToolButton.InstantPopup)
+        self.indicators_menu = QtWidgets.QMenu(self.indicators_button)
+        self.indicators_button.setMenu(self.indicators_menu)
+        self.panel_layout.addWidget(self.indicators_button)
+        self.perf_hud_checkbox = QtWidgets.QCheckBox()
+        self.perf_hud_checkbox.setText("Perf HUD")
+        self.panel_layout.addWidget(self.perf_hud_checkbox)
+        self.perf_dump_button = QtWidgets.QPushButton('Save perf JSON')
+        self.panel_layout.addWidget(self.perf_dump_button)
         vertical_layout_2.addLayout(self.panel_layout, 1)
+        # time and OHLCV of candle under cross hair
+        self.crosshair_label = QtWidgets.QLabel()
+        vertical_layout_2.addWidget(self.crosshair_label)
 
-        self.price_chart = PlotWidget()
+        self.price_chart = PaintedPlotWidget()
         self.price_chart.setBackground("w")
         self.price_chart.hideButtons()
         self.price_chart.showGrid(True, True)
@@ -74,6 +106,13 @@ class TabChartView(QtWidgets.QWidget):
         self.price_chart.getAxis('bottom').setStyle(showValues=False)
         self.price_chart.getAxis('left').setStyle(showValues=False)
         self.price_chart.getViewBox().setLimits(yMin=-1, xMin=-1)
+        # performance overlay over price chart: latency p50/p99, messages/sec and queue depth
+        self.perf_hud_label = QtWidgets.QLabel(self.price_chart)
+        self.perf_hud_label.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.perf_hud_label.setStyleSheet('background-color: rgba(255, 255, 255, 200); color: black; padding: 4px')
+        self.perf_hud_label.setAttribute(Qt.Qt.WA_TransparentForMouseEvents)
+        self.perf_hud_label.move(10, 30)
+        self.perf_hud_label.hide()
 
         time_axis = CustomAxisItem(orientation='bottom')
         self.volume_chart = PlotWidget(axisItems={'bottom': time_axis})
@@ -84,8 +123,20 @@ class TabChartView(QtWidgets.QWidget):
         self.volume_chart.getAxis('left').setStyle(showValues=False)
         self.volume_chart.getViewBox().setLimits(yMin=-1, xMin=-1)
 
+        # chart of indicators with own scale (RSI), hidden while such indicators off
+        self.oscillator_chart = PlotWidget()
+        self.oscillator_chart.setBackground("w")
+        self.oscillator_chart.hideButtons()
+        self.oscillator_chart.showGrid(True, True)
+        self.oscillator_chart.getPlotItem().showAxis('right')
+        self.oscillator_chart.getAxis('bottom').setStyle(showValues=False)
+        self.oscillator_chart.getAxis('left').setStyle(showValues=False)
+        self.oscillator_chart.hide()
+
         self.price_chart.setXLink(self.volume_chart)
+        self.oscillator_chart.setXLink(self.volume_chart)
 
         vertical_layout_2.addWidget(self.price_chart, 4)
+        vertical_layout_2.addWidget(self.oscillator_chart, 1)
         vertical_layout_2.addWidget(self.volume_chart, 1)
         horizontal_layout.addLayout(vertical_layout_2, 5)
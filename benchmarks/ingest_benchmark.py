@@ -0,0 +1,193 @@
+"""
+End-to-end ingest benchmark.
+
+Start local QuoteServer in other process, open TabChartView headless (offscreen Qt platform),
+subscribe to tickers, chart and depth like user and measure:
+    messages/sec received by WSManager and applied by controller slots
+    latency from WS receive to model applied (p50, p90, p99, max) per stream type
+    dispatcher queue statistics
+    hot path latency of LatencyMonitor: WS receive -> decode -> emit -> slot -> paint (paint only with --show)
+
+Start: python -m benchmarks.ingest_benchmark --symbols 50 --rate 20 --duration 10 --json result.json
+"""
+from multiprocessing import Process
+from functools import partial
+import numpy as np
+import argparse
+import socket
+import json
+import time
+import sys
+import os
+
+
+def _run_server(port, symbols, rate, history, depth_levels):
+    from aiohttp import web
+    from benchmarks.quote_server import QuoteServer
+
+    server = QuoteServer(symbols=symbols, rate=rate, history=history, depth_levels=depth_levels)
+    web.run_app(server.make_app(), host='127.0.0.1', port=port, print=None)
+
+
+def _wait_port(port, timeout=10.):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f'Quote server not started on port {port}')
+
+
+def percentiles(values):
+    """Return dict with count, p50, p90, p99 and max of values in milliseconds"""
+    if not values:
+        return dict(count=0)
+    values = np.asarray(values) * 1000
+    return dict(count=len(values), p50=float(np.percentile(values, 50)), p90=float(np.percentile(values, 90)),
+                p99=float(np.percentile(values, 99)), max=float(values.max()))
+
+
+class IngestBenchmark:
+    """Drive TabChartController headless and collect ingest statistics"""
+
+    def __init__(self, port, tickers, warmup, duration, use_process=False, show=False):
+        self._port = port
+        self._show = show
+        self._use_process = use_process
+        self._tickers = tickers
+        self._warmup = warmup
+        self._duration = duration
+
+        self._received_at = dict()
+        self._measuring = False
+        self._received = 0
+        self._applied = dict()
+        self._latencies = dict()
+
+    def run(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5 import QtWidgets, QtCore
+        from app.controllers.tab_chart_controller import TabChartController
+
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        TabChartController.WSManager.ws_address = f'ws://127.0.0.1:{self._port}/api/v1/ws'
+        # benchmark must not use and fill cache of user
+        TabChartController.CANDLE_CACHE_PATH = ':memory:'
+        TabChartController.WSManager.USE_PROCESS = self._use_process
+        from app.views.tab_chart import TabChartView
+
+        view = TabChartView()
+        controller = view._controller
+        ws_manager = controller._ws_manager
+        self._instrument(ws_manager)
+        ws_manager.latency.enable()
+        if self._show:
+            view.resize(1280, 720)
+            view.show()
+        ws_manager.update_listing_signal.connect(partial(self._subscribe, view, controller))
+
+        def start_measure():
+            self._received = 0
+            self._applied, self._latencies = dict(), dict()
+            ws_manager.latency.reset()
+            self._measuring = True
+        QtCore.QTimer.singleShot(int(self._warmup * 1000), start_measure)
+        QtCore.QTimer.singleShot(int((self._warmup + self._duration) * 1000), app.quit)
+        app.exec_()
+        self._measuring = False
+
+        result = dict(duration=self._duration,
+                      received_per_sec=self._received / self._duration,
+                      applied_per_sec={kind: count / self._duration for kind, count in self._applied.items()},
+                      latency_ms={kind: percentiles(values) for kind, values in self._latencies.items()},
+                      dispatcher=ws_manager.dispatcher.stats(),
+                      hot_path=ws_manager.latency.snapshot())
+
+        ws_manager.stop_consume()
+        return result
+
+    def _instrument(self, ws_manager):
+        """
+        Save receive time of every event and measure time when controller slots applied it.
+
+        In process mode messages parsed in worker process, so receive time is time of read from shared memory.
+        """
+        parse, put = ws_manager._parser.parse, ws_manager.dispatcher.put
+        received_at = [None]
+
+        def timed_parse(raw):
+            received_at[0] = time.perf_counter()
+            event = parse(raw)
+            if self._measuring:
+                self._received += 1
+            return event
+        ws_manager._parser.parse = timed_parse
+
+        # event can be replaced after parse (depth grouping), so time saved for event, that put in dispatcher
+        def timed_put(kind, data_id, message):
+            if self._use_process:
+                received_at[0] = time.perf_counter()
+                if self._measuring:
+                    self._received += 1
+            self._received_at[id(message)] = received_at[0]
+            put(kind, data_id, message)
+        ws_manager.dispatcher.put = timed_put
+
+        # connect after controller slots, so called when model already updated
+        for kind, signal in (('ticker', ws_manager.update_ticker_signal), ('depth', ws_manager.update_depth_signal),
+                             ('candles', ws_manager.update_candles_signal)):
+            signal.connect(partial(self._applied_slot, kind))
+
+    def _applied_slot(self, kind, events):
+        # tickers delivered in list
+        events = events if isinstance(events, list) else [events]
+        applied_at = time.perf_counter()
+        for event in events:
+            received_at = self._received_at.pop(id(event), None)
+            if not self._measuring or received_at is None:
+                continue
+            self._applied[kind] = self._applied.get(kind, 0) + 1
+            self._latencies.setdefault(kind, []).append(applied_at - received_at)
+
+    def _subscribe(self, view, controller, event):
+        """Add tickers and open chart by UI events like user"""
+        for ind in range(1, min(self._tickers, view.pairs_combobox.count() - 1) + 1):
+            controller._select_new_symbol_event(ind)
+        if view.tickers_table.model().rowCount(None):
+            controller._double_click_symbol_event(view.tickers_table.model().index(0, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end ingest benchmark with local quote server')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--symbols', type=int, default=50, help='count of pairs on every exchange of server')
+    parser.add_argument('--tickers', type=int, default=50, help='count of subscribed tickers')
+    parser.add_argument('--rate', type=float, default=20., help='server updates per second for every subscription')
+    parser.add_argument('--history', type=int, default=2000, help='count of candles in starting message')
+    parser.add_argument('--depth-levels', type=int, default=100)
+    parser.add_argument('--warmup', type=float, default=2.)
+    parser.add_argument('--duration', type=float, default=10.)
+    parser.add_argument('--process', action='store_true', help='WS connection and parsing in separate process')
+    parser.add_argument('--show', action='store_true', help='show window (offscreen), so paint latency measured')
+    parser.add_argument('--json', help='path for save result in JSON')
+    args = parser.parse_args()
+
+    server = Process(target=_run_server, args=(args.port, args.symbols, args.rate, args.history, args.depth_levels),
+                     daemon=True)
+    server.start()
+    try:
+        _wait_port(args.port)
+        result = IngestBenchmark(args.port, args.tickers, args.warmup, args.duration, args.process,
+                                args.show).run()
+    finally:
+        server.kill()
+
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
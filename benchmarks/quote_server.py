@@ -0,0 +1,258 @@
+"""
+Local stand-in for cryptocurrency_quotes server.
+
+Speak the same WS protocol as server: client send {"action": "sub"|"unsub", "data_id": ...},
+server send listing_info, starting/update candles, ticker, depth and error messages.
+Protocol extension for pages of older candles: client send {"action": "history", "data_id": <candles data_id>,
+"before": time, "limit": count}, server answer 'history.<data_id>' with candles older than time (empty - no more).
+All data random walk, count of symbols and rate of messages configurable.
+
+Start: python -m benchmarks.quote_server --port 8080 --symbols 20 --rate 10
+"""
+from aiohttp import web, WSMsgType
+import argparse
+import asyncio
+import bisect
+import random
+import json
+import time
+
+
+class QuoteStream:
+    """Random walk state of one symbol"""
+
+    def __init__(self, price):
+        self.price = price
+
+    def step(self):
+        self.price = max(self.price * (1 + random.gauss(0, 0.001)), 1e-8)
+        return self.price
+
+
+class CandleStream:
+    """Candles of one symbol and time frame. Every update change last candle, new candle start after some updates"""
+
+    def __init__(self, quote, time_frame_seconds, history, updates_per_candle):
+        self._quote = quote
+        self._seconds = time_frame_seconds
+        self._updates_per_candle = updates_per_candle
+        self._updates = 0
+        start = (int(time.time()) // self._seconds - history) * self._seconds
+        self.candles = []
+        for ind in range(history):
+            self._new_candle(start + ind * self._seconds)
+            for _ in range(4):
+                self._update_last()
+
+    def _new_candle(self, candle_time):
+        price = self._quote.step()
+        self.candles.append([price, price, price, price, 0., candle_time])
+
+    def _generate_older(self, count):
+        """Add count candles before first candle (random walk backward)"""
+        price, first_time = self.candles[0][0], self.candles[0][5]
+        older = []
+        for ind in range(1, count + 1):
+            close = price
+            price = max(price * (1 + random.gauss(0, 0.002)), 1e-8)
+            high = max(price, close) * (1 + abs(random.gauss(0, 0.001)))
+            low = min(price, close) * (1 - abs(random.gauss(0, 0.001)))
+            older.append([price, high, low, close, random.uniform(0, 40), first_time - ind * self._seconds])
+        self.candles[:0] = older[::-1]
+
+    def older(self, before, limit, max_history):
+        """Return up to limit candles older than time before. Stream has not more than max_history old candles"""
+        index = bisect.bisect_left([candle[5] for candle in self.candles], before)
+        if index < limit and len(self.candles) < max_history:
+            count = min(limit - index, max_history - len(self.candles))
+            self._generate_older(count)
+            index += count
+        return self.candles[max(index - limit, 0):index]
+
+    def _update_last(self):
+        price = self._quote.step()
+        candle = self.candles[-1]
+        candle[1] = max(candle[1], price)
+        candle[2] = min(candle[2], price)
+        candle[3] = price
+        candle[4] += random.uniform(0, 10)
+
+    def step(self):
+        """Return last candle after update"""
+        self._updates += 1
+        if self._updates % self._updates_per_candle == 0:
+            self._new_candle(self.candles[-1][5] + self._seconds)
+        else:
+            self._update_last()
+        return self.candles[-1]
+
+
+class QuoteServer:
+    """
+    WS server with random market data.
+
+    :param exchanges: names of exchanges
+    :param symbols: count of pairs on every exchange
+    :param rate: count of updates per second for every subscribed data_id
+    :param history: count of candles in 'starting' message
+    :param depth_levels: count of levels on every side of depth
+    :param updates_per_candle: count of candle updates before new candle
+    :param max_history: count of candles, after that 'history' answer empty page
+    """
+
+    TIME_FRAMES = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+    HISTORY_LIMIT = 1000
+
+    def __init__(self, exchanges=('binance', 'bitfinex'), symbols=20, rate=10., history=500, depth_levels=50,
+                 updates_per_candle=20, max_history=5000):
+        self._exchanges = list(exchanges)
+        self._pairs = [f'PAIR{ind:04d}USDT' for ind in range(symbols)]
+        self._rate = rate
+        self._history = history
+        self._depth_levels = depth_levels
+        self._updates_per_candle = updates_per_candle
+        self._max_history = max_history
+        self._quotes = dict()
+        self._candles = dict()
+        self.sent = 0
+
+    def listing(self):
+        return {exchange: [list(QuoteServer.TIME_FRAMES.keys()), list(self._pairs)] for exchange in self._exchanges}
+
+    def _quote(self, exchange, pair):
+        if (exchange, pair) not in self._quotes:
+            self._quotes[(exchange, pair)] = QuoteStream(random.uniform(0.0001, 50000))
+        return self._quotes[(exchange, pair)]
+
+    def _candle_stream(self, exchange, pair, time_frame):
+        key = (exchange, pair, time_frame)
+        if key not in self._candles:
+            self._candles[key] = CandleStream(self._quote(exchange, pair), QuoteServer.TIME_FRAMES[time_frame],
+                                              self._history, self._updates_per_candle)
+        return self._candles[key]
+
+    def _check(self, fragment_id):
+        """Return error text for bad data_id or None"""
+        if len(fragment_id) < 3 or fragment_id[0] not in ('ticker', 'depth', 'candles'):
+            return 'Unknown data type'
+        if fragment_id[1] not in self._exchanges:
+            return 'Unknown exchange'
+        if fragment_id[2] not in self._pairs:
+            return 'Unknown pair'
+        if fragment_id[0] == 'candles' and (len(fragment_id) < 4 or fragment_id[3] not in QuoteServer.TIME_FRAMES):
+            return 'Unknown time frame'
+        return None
+
+    def starting_message(self, data_id):
+        """Return first message after subscribe or None"""
+        fragment_id = data_id.split('.')
+        if fragment_id[0] == 'candles':
+            candles = self._candle_stream(*fragment_id[1:4]).candles
+            return {'data_id': f'starting.{data_id}', 'data': [self._format_candle(item) for item in candles]}
+        return None
+
+    def history_message(self, data_id, before, limit):
+        """Return page of candles older than time before"""
+        candles = self._candle_stream(*data_id.split('.')[1:4]).older(before, min(limit, self.HISTORY_LIMIT),
+                                                                       self._max_history)
+        return {'data_id': f'history.{data_id}', 'data': [self._format_candle(item) for item in candles]}
+
+    def update_message(self, data_id):
+        fragment_id = data_id.split('.')
+        if fragment_id[0] == 'candles':
+            data = self._format_candle(self._candle_stream(*fragment_id[1:4]).step())
+        elif fragment_id[0] == 'ticker':
+            price = self._quote(*fragment_id[1:3]).step()
+            data = [repr(price * 0.9995), repr(price * 1.0005)]
+        else:
+            price = self._quote(*fragment_id[1:3]).step()
+            step = price * 0.0001
+            buy = [[repr(price - step * (ind + 1)), repr(random.uniform(0, 5))] for ind in range(self._depth_levels)]
+            sell = [[repr(price + step * (self._depth_levels - ind)), repr(random.uniform(0, 5))]
+                    for ind in range(self._depth_levels)]
+            data = [buy, sell]
+        return {'data_id': f'update.{data_id}', 'data': data}
+
+    @staticmethod
+    def _format_candle(candle):
+        return [repr(value) for value in candle[:5]] + [candle[5]]
+
+    async def _send(self, ws, message):
+        await ws.send_str(json.dumps(message))
+        self.sent += 1
+
+    async def _produce(self, ws, subscriptions):
+        """Send updates for all subscriptions of one client with self._rate per second"""
+        interval = 1. / self._rate
+        while not ws.closed:
+            started = time.perf_counter()
+            for data_id in list(subscriptions):
+                await self._send(ws, self.update_message(data_id))
+            await asyncio.sleep(max(interval - (time.perf_counter() - started), 0))
+
+    async def ws_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        subscriptions = []
+        producer = asyncio.ensure_future(self._produce(ws, subscriptions))
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                await self.on_message(ws, json.loads(message.data), subscriptions)
+        finally:
+            producer.cancel()
+        return ws
+
+    async def on_message(self, ws, message, subscriptions):
+        """Process message from client"""
+        action, data_id = message.get('action'), message.get('data_id')
+        if data_id == 'listing_info':
+            await self._send(ws, {'data_id': 'listing_info', 'data': self.listing()})
+            return
+
+        error = self._check(data_id.split('.'))
+        if action == 'history':
+            if not error and not data_id.startswith('candles.'):
+                error = 'History only for candles'
+            if error:
+                await self._send(ws, {'data_id': f'history.{data_id}', 'error': error})
+            else:
+                await self._send(ws, self.history_message(data_id, int(message['before']), int(message['limit'])))
+            return
+        if error:
+            await self._send(ws, {'data_id': f'{action}.{data_id}', 'error': error})
+            return
+
+        if action == 'sub' and data_id not in subscriptions:
+            subscriptions.append(data_id)
+            starting = self.starting_message(data_id)
+            if starting:
+                await self._send(ws, starting)
+        elif action == 'unsub' and data_id in subscriptions:
+            subscriptions.remove(data_id)
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get('/api/v1/ws', self.ws_handler)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for cryptocurrency_quotes server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--symbols', type=int, default=20, help='count of pairs on every exchange')
+    parser.add_argument('--rate', type=float, default=10., help='updates per second for every subscription')
+    parser.add_argument('--history', type=int, default=500, help='count of candles in starting message')
+    parser.add_argument('--depth-levels', type=int, default=50)
+    parser.add_argument('--max-history', type=int, default=5000, help='count of candles available by history pages')
+    args = parser.parse_args()
+
+    server = QuoteServer(symbols=args.symbols, rate=args.rate, history=args.history, depth_levels=args.depth_levels,
+                         max_history=args.max_history)
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Headless rendering benchmark of chart items.
+
+Time operations of StockPriceSeries (all chart types), VolumeSeries and CustomAxisItem on shared CandleStore:
+    set_data - CandleStore.set_data with reset of all items
+    append_or_replace - CandleStore.append_or_replace with incremental repaint (3 replaces of last, 1 append)
+    update_picture - full repaint of item
+    paint_zoomed, paint_full - item paint into QImage, when visible last 100 candles and all candles
+    dataBounds, tickStrings - auto-scaling and axis labels
+Result print as JSON lines (one record for every measure), so can be compared between commits.
+
+Start: python -m benchmarks.render_benchmark --sizes 1000 10000 100000 1000000 --json render.json
+"""
+import numpy as np
+import argparse
+import json
+import time
+import sys
+import os
+
+
+def generate_candles(count, seed=0):
+    """Return random walk candles np.ndarray with rows [open, high, low, close, volume, time]"""
+    random = np.random.RandomState(seed)
+    closes = 100 * np.exp(np.cumsum(random.normal(0, 0.001, count)))
+    opens = np.concatenate(([100.], closes[:-1]))
+    highs = np.maximum(opens, closes) * (1 + random.uniform(0, 0.001, count))
+    lows = np.minimum(opens, closes) * (1 - random.uniform(0, 0.001, count))
+    volumes = random.uniform(0, 10, count)
+    times = 1600000000 + 60 * np.arange(count)
+    return np.column_stack((opens, highs, lows, closes, volumes, times))
+
+
+def measure(function, repeat):
+    """Return dict with mean and min time of function in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return dict(mean_ms=float(np.mean(times)), min_ms=float(np.min(times)), repeat=repeat)
+
+
+class RenderBenchmark:
+    """Chart items in PlotWidgets like TabChartView, but without controller and server"""
+
+    WIDTH, HEIGHT = 1200, 600
+
+    def __init__(self, repeat):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5 import QtWidgets, QtGui
+        from app.models import StockPriceSeries, VolumeSeries, CustomAxisItem, CandleStore
+        import pyqtgraph as pg
+
+        self._app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        self._qt_gui = QtGui
+        self._repeat = repeat
+        self.store = CandleStore()
+        self.axis = CustomAxisItem(self.store, orientation='bottom')
+        self.prices = StockPriceSeries(self.store)
+        self.volumes = VolumeSeries(self.store)
+
+        self.price_chart = pg.PlotWidget()
+        self.volume_chart = pg.PlotWidget(axisItems={'bottom': self.axis})
+        for chart, item in ((self.price_chart, self.prices), (self.volume_chart, self.volumes)):
+            chart.resize(self.WIDTH, self.HEIGHT)
+            chart.addItem(item)
+            chart.show()
+        self.price_chart.setXLink(self.volume_chart)
+        self._app.processEvents()
+
+    def _set_x_range(self, start, stop):
+        self.price_chart.getViewBox().setRange(xRange=[start, stop], padding=0)
+        self._app.processEvents()
+
+    def _paint(self, item, chart):
+        """Paint item into QImage with the same transform as on screen"""
+        image = self._qt_gui.QImage(self.WIDTH, self.HEIGHT, self._qt_gui.QImage.Format_ARGB32_Premultiplied)
+        painter = self._qt_gui.QPainter(image)
+        painter.setTransform(item.sceneTransform() * chart.viewportTransform())
+        item.paint(painter, None, None)
+        painter.end()
+
+    def run(self, size, chart_types):
+        candles = generate_candles(size)
+        records = []
+
+        def record(item, chart_type, operation, result):
+            records.append(dict(item=item, chart_type=chart_type, size=size, operation=operation, **result))
+
+        def paint_prices():
+            self._paint(self.prices, self.price_chart)
+
+        def paint_volumes():
+            self._paint(self.volumes, self.volume_chart)
+
+        for chart_type in chart_types:
+            self.prices.set_chart_type(chart_type)
+            record('CandleStore', chart_type, 'set_data',
+                   measure(lambda: self.store.set_data(candles), min(self._repeat, 3)))
+
+            self._set_x_range(size - 100, size)
+            last = candles[-1].copy()
+
+            def append_or_replace():
+                for ind in range(4):
+                    last[3] *= 1.0001
+                    if ind == 3:
+                        last[5] += 60
+                    self.store.append_or_replace(last)
+            record('CandleStore', chart_type, 'append_or_replace', measure(append_or_replace, self._repeat))
+
+            record('StockPriceSeries', chart_type, 'update_picture',
+                   measure(self.prices.update_picture, min(self._repeat, 3)))
+            record('StockPriceSeries', chart_type, 'paint_zoomed', measure(paint_prices, self._repeat))
+            record('StockPriceSeries', chart_type, 'dataBounds', measure(lambda: self.prices.dataBounds(1),
+                                                                          self._repeat))
+            self._set_x_range(0, len(self.store))
+            record('StockPriceSeries', chart_type, 'paint_full', measure(paint_prices, self._repeat))
+            record('StockPriceSeries', chart_type, 'dataBounds_full', measure(lambda: self.prices.dataBounds(1),
+                                                                               self._repeat))
+
+        self._set_x_range(size - 100, size)
+        record('VolumeSeries', None, 'update_picture', measure(self.volumes.update_picture, min(self._repeat, 3)))
+        record('VolumeSeries', None, 'paint_zoomed', measure(paint_volumes, self._repeat))
+        record('VolumeSeries', None, 'dataBounds', measure(lambda: self.volumes.dataBounds(1), self._repeat))
+        values = list(np.linspace(size - 100, size - 1, 10))
+        record('CustomAxisItem', None, 'tickStrings', measure(lambda: self.axis.tickStrings(values, 1, 10),
+                                                              self._repeat))
+        self._set_x_range(0, len(self.store))
+        record('VolumeSeries', None, 'paint_full', measure(paint_volumes, self._repeat))
+        record('VolumeSeries', None, 'dataBounds_full', measure(lambda: self.volumes.dataBounds(1), self._repeat))
+        return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless rendering benchmark of chart items')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--chart-types', nargs='+', default=['candles', 'bar', 'line'])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', help='path for save all records as JSON list')
+    args = parser.parse_args()
+
+    benchmark = RenderBenchmark(args.repeat)
+    records = []
+    for size in args.sizes:
+        for item in benchmark.run(size, args.chart_types):
+            print(json.dumps(item))
+            records.append(item)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(records, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,11 @@ if __name__ == "__main__":
     import sys
     from PyQt5 import QtWidgets
     from app.views.general_ui import GeneralUI
+    from app.controllers import profiling
 
     app = QtWidgets.QApplication(sys.argv)
+    # wrap slots and paint methods by timers, if QUOTES_PROFILE set (before controllers created)
+    profiling.install(app)
     MainWindow = QtWidgets.QMainWindow()
     ui = GeneralUI(MainWindow)
     MainWindow.showMaximized()